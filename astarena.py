@@ -0,0 +1,300 @@
+from array import array
+
+from parser import (
+    NoOp, UnaryOp, BinOp, Num, Compound, Assign, Var,
+    Program, Block, VarDecl, Type, ProcedureDecl, Ternary,
+)
+
+
+# node kind codes, the index in this tuple
+NODE_KINDS = (
+    NoOp, UnaryOp, BinOp, Num, Compound, Assign, Var,
+    Program, Block, VarDecl, Type, ProcedureDecl, Ternary,
+)
+
+KIND_CODES = {cls: code for code, cls in enumerate(NODE_KINDS)}
+
+
+
+class ASTArena:
+    """ Flat AST: parallel arrays instead of one object per node
+
+        node i has kind NODE_KINDS[kinds[i]], operands a[i] and b[i], the
+        constant consts[const[i]] (a token or a name) and the analyzer's
+        annotation consts[note[i]]:
+
+            UnaryOp         a=expr                  const=op        note=(type, impl)
+            BinOp           a=left, b=right         const=op        note=(type, impl)
+            Assign          a=left, b=right         const=op        note=coerce
+            Num, Type                               const=token
+            Var             a=level, b=slot         const=token     note=symbol
+            Compound        children[a:a+b]
+            Block           declarations children[a:a+b], compound children[a+b],
+                            const=scope
+            VarDecl         a=var_node, b=type_node
+            ProcedureDecl   a=block_node            const=proc_name
+            Program         a=block                 const=name
+            Ternary         condition, true_expr, false_expr children[a:a+3],
+                            const=op, note=type
+
+        arena.node(i) returns a read-only view of node i. views are instances
+        of the AST classes, so every NodeVisitor walks them like the tree.
+        views are rebuilt on every access: analyze the tree before flattening
+        it, its annotations are copied into the arena.
+    """
+    def __init__(self):
+        self.kinds = array("B")
+        self.a = array("i")
+        self.b = array("i")
+        self.const = array("i")
+        self.note = array("i")
+        self.children = array("i")
+        self.consts = []
+        self._interned = {} # (type, value) -> index in consts
+        self.root = -1
+
+    def __len__(self):
+        return len(self.kinds)
+
+
+    @classmethod
+    def from_tree(cls, tree):
+        arena = cls()
+        arena.root = arena.add(tree)
+        return arena
+
+
+    def add(self, node):
+        """ append `node` and its subtree, return the index of `node`
+
+            the subtree is walked with an explicit stack, not recursion, so
+            any tree the parser builds can be flattened. the nodes go in in
+            postorder, children before their parent.
+        """
+        indices = [] # of the nodes added, children waiting for their parent
+        stack = [(node, False)]
+        while stack:
+            node, expanded = stack.pop()
+            children = _subtrees(node)
+            if(expanded or not children):
+                if children:
+                    operands = indices[len(indices) - len(children):]
+                    del indices[len(indices) - len(children):]
+                else:
+                    operands = ()
+                indices.append(self._append(node, operands))
+            else:
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(children))
+        return indices[0]
+
+
+    def _append(self, node, operands):
+        """ append `node`, its children already added at the indices operands """
+        kind = type(node)
+        a = b = const = note = -1
+
+        if kind is BinOp or kind is Assign:
+            a, b = operands
+            const = self._const(node.op)
+            note = self._const((node.type, node.impl) if kind is BinOp else node.coerce)
+        elif kind is Num or kind is Type:
+            const = self._const(node.token)
+        elif kind is Var:
+            a = -1 if node.level is None else node.level
+            b = -1 if node.slot is None else node.slot
+            const = self._const(node.token)
+            note = self._const(node.symbol)
+        elif kind is UnaryOp:
+            a, = operands
+            const = self._const(node.op)
+            note = self._const((node.type, node.impl))
+        elif kind is Compound:
+            a, b = self._run(operands)
+        elif kind is Block:
+            a, b = self._run(operands)
+            b -= 1
+            const = self._const(node.scope)
+        elif kind is VarDecl:
+            a, b = operands
+        elif kind is ProcedureDecl:
+            a, = operands
+            const = self._const(node.proc_name)
+        elif kind is Program:
+            a, = operands
+            const = self._const(node.name)
+        elif kind is Ternary:
+            a, b = self._run(operands)
+            const = self._const(node.op)
+            note = self._const(node.type)
+
+        self.kinds.append(KIND_CODES[kind])
+        self.a.append(a)
+        self.b.append(b)
+        self.const.append(const)
+        self.note.append(note)
+        return len(self.kinds) - 1
+
+
+    def _const(self, value):
+        """ index of value in consts, stored once: the notes of the operators
+            repeat, names too; tokens and symbols are one per object
+        """
+        # int 1 and float 1.0 are equal dict keys, so key by type too
+        key = (type(value), value)
+        index = self._interned.get(key)
+        if(index is None):
+            index = self._interned[key] = len(self.consts)
+            self.consts.append(value)
+        return index
+
+
+    def _run(self, indices):
+        """ store the indices of added nodes as one run in self.children """
+        start = len(self.children)
+        self.children.extend(indices)
+        return start, len(indices)
+
+
+    def node(self, index):
+        view = object.__new__(VIEWS[self.kinds[index]])
+        view._arena = self
+        view._index = index
+        return view
+
+
+    def tree(self):
+        """ view of the root node """
+        return self.node(self.root)
+
+
+
+def _subtrees(node):
+    """ the child nodes of a tree node, in the order the arena stores them """
+    kind = type(node)
+    if kind is BinOp or kind is Assign:
+        return (node.left, node.right)
+    if kind is UnaryOp:
+        return (node.expr,)
+    if kind is Compound:
+        return node.children
+    if kind is Block:
+        return node.declarations + [node.compound_statement]
+    if kind is VarDecl:
+        return (node.var_node, node.type_node)
+    if kind is ProcedureDecl:
+        return (node.block_node,)
+    if kind is Program:
+        return (node.block,)
+    if kind is Ternary:
+        return (node.condition, node.true_expr, node.false_expr)
+    return ()
+
+
+
+def _operand(column):
+    def get(self):
+        arena = self._arena
+        return arena.node(getattr(arena, column)[self._index])
+    return property(get)
+
+
+def _constant(self):
+    arena = self._arena
+    return arena.consts[arena.const[self._index]]
+
+
+def _annotation(column):
+    def get(self):
+        value = getattr(self._arena, column)[self._index]
+        return None if value == -1 else value
+    return property(get)
+
+
+def _note(self):
+    arena = self._arena
+    return arena.consts[arena.note[self._index]]
+
+
+def _type_note(self):
+    return _note(self)[0]
+
+
+def _impl_note(self):
+    return _note(self)[1]
+
+
+def _children(self):
+    arena = self._arena
+    start = arena.a[self._index]
+    return [arena.node(i) for i in arena.children[start:start + arena.b[self._index]]]
+
+
+def _compound_statement(self):
+    arena = self._arena
+    return arena.node(arena.children[arena.a[self._index] + arena.b[self._index]])
+
+
+def _child(position):
+    def get(self):
+        arena = self._arena
+        return arena.node(arena.children[arena.a[self._index] + position])
+    return property(get)
+
+
+def _view(cls, **fields):
+    """ subclass of an AST class whose fields read from the arena """
+    namespace = {"__slots__": ("_arena", "_index")}
+    namespace.update(fields)
+    return type(cls.__name__, (cls,), namespace)
+
+
+# views keep the AST class name, so name-based visit_<Class> dispatch finds them
+VIEWS = tuple(
+    _view(cls, **fields) for cls, fields in (
+        (NoOp, {}),
+        (UnaryOp, dict(
+            op=property(_constant),
+            expr=_operand("a"),
+            type=property(_type_note),
+            impl=property(_impl_note),
+        )),
+        (BinOp, dict(
+            left=_operand("a"),
+            right=_operand("b"),
+            op=property(_constant),
+            type=property(_type_note),
+            impl=property(_impl_note),
+        )),
+        (Num, dict(token=property(_constant))),
+        (Compound, dict(children=property(_children))),
+        (Assign, dict(
+            left=_operand("a"),
+            right=_operand("b"),
+            op=property(_constant),
+            coerce=property(_note),
+        )),
+        (Var, dict(
+            token=property(_constant),
+            symbol=property(_note),
+            level=_annotation("a"),
+            slot=_annotation("b"),
+        )),
+        (Program, dict(name=property(_constant), block=_operand("a"))),
+        (Block, dict(
+            declarations=property(_children),
+            compound_statement=property(_compound_statement),
+            scope=property(_constant),
+        )),
+        (VarDecl, dict(var_node=_operand("a"), type_node=_operand("b"))),
+        (Type, dict(token=property(_constant))),
+        (ProcedureDecl, dict(proc_name=property(_constant), block_node=_operand("a"))),
+        (Ternary, dict(
+            condition=_child(0),
+            true_expr=_child(1),
+            false_expr=_child(2),
+            op=property(_constant),
+            type=property(_note),
+        )),
+    )
+)
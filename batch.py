@@ -0,0 +1,212 @@
+""" Runs many Pascal programs in a pool of worker processes
+
+    $ python batch.py a.pas b.pas ...
+    $ python batch.py --manifest nightly.txt --workers 8 --timeout 5
+    $ python batch.py --cache a.pas b.pas ...
+
+    one JSON object per program is written to stdout as soon as it is done:
+    {"path": ..., "status": "ok", "memory": {...}, "seconds": ...}
+    status is "error" (with "error") when the program doesn't parse, analyze or
+    run, "timeout" when it ran longer than --timeout and "crashed" when its
+    worker died. the workers import the interpreter once and run program after
+    program; one that times out or crashes is replaced by a new one.
+"""
+import json
+import os
+import sys
+import time
+import multiprocessing
+from multiprocessing.connection import wait
+
+from cache import ASTCache
+from interpreter import Interpreter, load_program
+
+
+
+def run_file(path, use_cache=False):
+    """ the result of running the program in path, as a JSON-able dict
+
+        with use_cache the analyzed tree is loaded from or stored in the
+        ASTCache next to it. off by default: a batch runs most programs once,
+        and storing a tree costs about as much as the front end.
+    """
+    start = time.perf_counter()
+    try:
+        cache = ASTCache.for_source(path) if use_cache else None
+        interpreter = Interpreter(load_program(path, cache))
+        interpreter.interpret()
+        result = dict(path=path, status="ok", memory=interpreter.GLOBAL_SCOPE)
+    except RecursionError:
+        result = dict(path=path, status="error", error="RecursionError: program nested too deeply")
+    except Exception as e:
+        result = dict(path=path, status="error", error="{}: {}".format(type(e).__name__, e))
+
+    result["seconds"] = round(time.perf_counter() - start, 6)
+    return result
+
+
+
+def _work(connection, use_cache):
+    """ worker process: run the paths it is sent until it is sent None """
+    while True:
+        path = connection.recv()
+        if path is None:
+            break
+        connection.send(run_file(path, use_cache))
+
+
+
+class _Worker:
+    def __init__(self, context, use_cache):
+        self.connection, theirs = context.Pipe()
+        self.process = context.Process(target=_work, args=(theirs, use_cache), daemon=True)
+        self.process.start()
+        theirs.close()
+        self.path = None # the program it is running
+        self.started = None
+        self.deadline = None
+
+
+    def send(self, path, timeout):
+        self.path = path
+        self.started = time.monotonic()
+        self.deadline = None if timeout is None else self.started + timeout
+        self.connection.send(path)
+
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        self.kill()
+
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.connection.close()
+
+
+
+def run_batch(paths, workers=None, timeout=None, use_cache=False):
+    """ run the programs in paths in `workers` processes
+
+        yields run_file()'s result for each one in the order they finish;
+        a program that runs longer than timeout seconds is stopped.
+        workers=None is one process per CPU (os.cpu_count()), workers=0 runs
+        the programs one after the other in this process, without a timeout.
+    """
+    if(workers == 0):
+        if timeout is not None:
+            raise ValueError("a timeout needs worker processes, workers=0 runs in this process")
+        for path in paths:
+            yield run_file(path, use_cache)
+        return
+
+    context = multiprocessing.get_context()
+    paths = iter(paths)
+    pool = [_Worker(context, use_cache) for _ in range(workers or os.cpu_count() or 1)]
+    idle = list(pool)
+    busy = {}
+    try:
+        while True:
+            while idle:
+                path = next(paths, None)
+                if path is None:
+                    break
+                worker = idle.pop()
+                worker.send(path, timeout)
+                busy[worker.connection] = worker
+            if not busy:
+                return
+
+            deadlines = [worker.deadline for worker in busy.values() if worker.deadline is not None]
+            wait_for = None if not deadlines else max(0, min(deadlines) - time.monotonic())
+            for connection in wait(list(busy), wait_for):
+                worker = busy.pop(connection)
+                try:
+                    result = connection.recv()
+                except EOFError:
+                    worker.process.join(1)
+                    result = dict(path=worker.path, status="crashed",
+                                  exitcode=worker.process.exitcode,
+                                  seconds=round(time.monotonic() - worker.started, 6))
+                    worker = _replace(pool, worker, context, use_cache)
+                idle.append(worker)
+                yield result
+
+            now = time.monotonic()
+            for connection, worker in list(busy.items()):
+                if(worker.deadline is not None and worker.deadline <= now):
+                    del busy[connection]
+                    idle.append(_replace(pool, worker, context, use_cache))
+                    yield dict(path=worker.path, status="timeout", seconds=timeout)
+    finally:
+        for worker in pool:
+            if worker.connection in busy:
+                worker.kill()
+            else:
+                worker.stop()
+
+
+
+def _replace(pool, worker, context, use_cache):
+    """ kill worker and put a new one in its place in the pool """
+    worker.kill()
+    new = _Worker(context, use_cache)
+    pool[pool.index(worker)] = new
+    return new
+
+
+
+def read_manifest(path):
+    """ the paths listed in a manifest, one per line, relative to its directory
+
+        blank lines and lines starting with # are skipped. "-" reads stdin,
+        which is left open.
+    """
+    if(path == "-"):
+        yield from _manifest_paths(sys.stdin, "")
+        return
+
+    with open(path) as lines:
+        yield from _manifest_paths(lines, os.path.dirname(path))
+
+
+
+def _manifest_paths(lines, directory):
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield os.path.join(directory, line)
+
+
+
+def main(argv=None):
+    import argparse
+    import itertools
+
+    argparser = argparse.ArgumentParser(description="Run Pascal programs in a pool of workers, JSON lines out")
+    argparser.add_argument("paths", nargs="*", help="Pascal source files")
+    argparser.add_argument("--manifest", action="append", default=[], help="file with one source path per line, - for stdin")
+    argparser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU, 0: run in this process)")
+    argparser.add_argument("--timeout", type=float, default=None, help="seconds a program may run")
+    argparser.add_argument("--cache", action="store_true", help="load and store the analyzed trees in __lsbasicache__, for programs run again and again (the first run of each pays for pickling its tree)")
+    args = argparser.parse_args(argv)
+
+    paths = itertools.chain(args.paths, *map(read_manifest, args.manifest))
+    failed = 0
+    out = sys.stdout
+    for result in run_batch(paths, args.workers, args.timeout, args.cache):
+        failed += result["status"] != "ok"
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+    return 1 if failed else 0
+
+
+
+if(__name__ == "__main__"):
+    sys.exit(main())
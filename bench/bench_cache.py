@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+""" Cold vs warm startup with the on-disk AST cache.
+
+    cold: empty cache, the front end runs and the tree is stored
+    warm: the tree is loaded from the cache
+
+    $ python bench/bench_cache.py
+    $ python bench/bench_cache.py --statements 1000 100000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from bench_compile import make_program
+from cache import ASTCache
+from interpreter import load_program
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def startup(path, *options):
+    """ wall time of a whole run.py run """
+    command = [sys.executable, os.path.join(ROOT, "run.py"), path, *options]
+    start = time.perf_counter()
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--statements", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = argparser.parse_args()
+
+    print("{:>10} {:>10} {:>10} {:>10} {:>8} {:>12} {:>12}".format(
+        "statements", "no cache", "cold s", "warm s", "speedup", "run cold s", "run warm s"))
+    for statements in args.statements:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "bench.pas")
+            with open(path, "w") as f:
+                f.write(make_program(statements // 2))
+            cache = ASTCache.for_source(path)
+
+            uncached = timed(load_program, path)
+            cold = timed(load_program, path, cache)
+            warm = timed(load_program, path, cache)
+
+            cache.clear()
+            run_cold = startup(path)
+            run_warm = startup(path)
+
+        print("{:>10} {:>10.3f} {:>10.3f} {:>10.3f} {:>7.1f}x {:>12.3f} {:>12.3f}".format(
+            statements, uncached, cold, warm, uncached / warm, run_cold, run_warm))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+""" Repeated execution: Interpreter.interpret() vs the compiled closures.
+
+    $ python bench/bench_compile.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from interpreter import Interpreter
+from lexer import Lexer
+from parser import Parser
+
+
+def make_program(statements):
+    lines = ["a := 3;", "b := 4.5;", "c := 7;"]
+    for i in range(statements):
+        lines.append("c := (a + {i}) * 2 - c DIV 3 + -a DIV 2;".format(i=i % 10))
+        lines.append("b := c - a * {i} + (b - 1.5) / 2;".format(i=i % 5))
+    return "PROGRAM Bench;\nVAR a, c : INTEGER;\n b : REAL;\nBEGIN\n{}\nEND.".format("\n".join(lines))
+
+
+def main():
+    runs = 1000
+    tree = Parser(Lexer(make_program(50), regex=True)).parse()
+
+    interpreter = Interpreter(tree)
+    start = time.perf_counter()
+    for _ in range(runs):
+        interpreter.interpret()
+    walk = time.perf_counter() - start
+
+    start = time.perf_counter()
+    program = interpreter.compile()
+    compile_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(runs):
+        memory = program.run()
+    compiled = time.perf_counter() - start
+
+    assert memory == interpreter.GLOBAL_SCOPE
+    print("{} runs of a 103 statement program".format(runs))
+    print("tree walk   {:7.3f} s".format(walk))
+    print("closures    {:7.3f} s  (+{:.4f} s compile)  {:.1f}x".format(compiled, compile_time, walk / compiled))
+
+
+if __name__ == "__main__":
+    main()
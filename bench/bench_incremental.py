@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+""" Reparse after a one-charactor edit: full parse vs IncrementalParser.edit().
+
+    replace: a digit is overwritten, type: a charactor is inserted and
+    deleted again, which moves every token after it.
+
+    $ python bench/bench_incremental.py
+    $ python bench/bench_incremental.py --statements 1000 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_compile import make_program
+from incremental import IncrementalParser
+from lexer import Lexer
+from parser import Parser
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--statements", type=int, nargs="+", default=[1000, 10000, 50000])
+    argparser.add_argument("--edits", type=int, default=20)
+    args = argparser.parse_args()
+
+    print("{:>10} {:>10} {:>12} {:>10} {:>8}".format("statements", "full s", "replace ms", "type ms", "reused"))
+    for statements in args.statements:
+        text = make_program(statements // 2)
+        start = time.perf_counter()
+        Parser(Lexer(text, regex=True)).parse()
+        full = time.perf_counter() - start
+
+        parser = IncrementalParser(text)
+        offset = text.index("2 - c", len(text) // 2) # a constant in the middle
+        start = time.perf_counter()
+        for i in range(args.edits):
+            parser.edit(offset, 1, str(i % 10))
+        replace = (time.perf_counter() - start) / args.edits
+
+        start = time.perf_counter()
+        for i in range(args.edits):
+            parser.edit(offset, 0, "0")
+            parser.edit(offset, 1, "")
+        typing = (time.perf_counter() - start) / (2 * args.edits)
+
+        print("{:>10} {:>10.3f} {:>12.3f} {:>10.3f} {:>8}".format(
+            statements, full, replace * 1000, typing * 1000, parser.reused))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+""" Microbenchmark: keyword classification and identifier interning.
+
+    $ python bench/bench_keywords.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lexer import Lexer
+from tokens import Token
+from tokens import Tokens
+
+
+NAMES = ["alpha", "beta", "gamma", "counter", "BEGIN", "END", "x1", "DIV", "total", "delta"] * 1000
+
+
+def reflection(name):
+    """ the old _id() classification """
+    if(hasattr(Tokens, name)):
+        return getattr(Tokens, name)
+    return Token(Tokens.ID, name)
+
+
+def main():
+    lexer = Lexer("")
+    # fresh str objects, as a char-by-char scanner builds them
+    names = ["".join(list(name)) for name in NAMES]
+    number = 50
+
+    old = timeit.timeit(lambda: [reflection(n) for n in names], number=number)
+    new = timeit.timeit(lambda: [lexer._reserved(n) for n in names], number=number)
+    per = number * len(names) / 1e9
+    print("classify   hasattr/getattr {:7.1f} ns   keyword table {:7.1f} ns".format(old / per, new / per))
+
+    # symbol table lookups: the table is built from interned names (as the
+    # declarations define them), the references are fresh or interned strs
+    interned = [lexer._reserved(n).value for n in names]
+    table = {name: i for i, name in enumerate(set(interned))}
+    fresh = timeit.timeit(lambda: [table.get(n) for n in names], number=number)
+    shared = timeit.timeit(lambda: [table.get(n) for n in interned], number=number)
+    print("lookup     fresh str       {:7.1f} ns   interned str  {:7.1f} ns".format(fresh / per, shared / per))
+
+
+if __name__ == "__main__":
+    main()
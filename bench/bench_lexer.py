@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+""" Compare the character scanner with the regex scanner engine of lexer.Lexer.
+
+    $ python bench/bench_lexer.py            # 1 MB, 10 MB and 100 MB inputs
+    $ python bench/bench_lexer.py --sizes 1 2
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lexer import Lexer
+from tokens import Tokens
+
+
+CHUNK = """\
+{ generated block }
+alpha := 10 * (beta + 3.25) - gamma DIV 4;
+beta := -alpha / 2.5 + 17;
+gamma := alpha ? beta : 0;
+"""
+
+
+def make_source(size):
+    """ a PROGRAM with a main block of roughly `size` bytes """
+    body = CHUNK * (size // len(CHUNK) + 1)
+    return "PROGRAM Bench;\nVAR alpha, beta, gamma : REAL;\nBEGIN\n" + body + "END.\n"
+
+
+def scan(text, regex):
+    lexer = Lexer(text, regex=regex)
+    count = 0
+    start = time.perf_counter()
+    while lexer.get_next_token().type != Tokens.EOF:
+        count += 1
+    return count, time.perf_counter() - start
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Lexer scanner benchmark.")
+    argparser.add_argument("--sizes", nargs="+", type=int, default=[1, 10, 100],
+                           help="input sizes in MB")
+    args = argparser.parse_args()
+
+    print("{:>6} {:>10} {:>10} {:>10} {:>8}".format("MB", "tokens", "char s", "regex s", "speedup"))
+    for mb in args.sizes:
+        text = make_source(mb * 1024 * 1024)
+        count, char_time = scan(text, regex=False)
+        regex_count, regex_time = scan(text, regex=True)
+        assert count == regex_count
+        print("{:>6} {:>10} {:>10.2f} {:>10.2f} {:>7.1f}x".format(
+            mb, count, char_time, regex_time, char_time / regex_time))
+
+
+if __name__ == "__main__":
+    main()
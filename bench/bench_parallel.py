@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+""" Sequential vs parallel compilation of a program with many procedures.
+
+    sequential: Parser with the SemanticAnalyzer, ConstantFolder, BytecodeCompiler
+    parallel:   parallel.compile_program() in this process (0 workers) and
+                with a ProcessPoolExecutor of 1, 2, 4, ... workers
+
+    $ python bench/bench_parallel.py
+    $ python bench/bench_parallel.py --procedures 2000 --workers 0 2 8
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bytecode import BytecodeCompiler, disassemble
+from interpreter import SemanticAnalyzer
+from lexer import Lexer
+from optimizer import ConstantFolder
+from parallel import compile_program
+from parser import Parser
+
+
+def make_program(procedures, statements=20):
+    lines = ["PROGRAM Bench;", "VAR a, c : INTEGER;", " b : REAL;"]
+    for p in range(procedures):
+        lines.append("PROCEDURE P{};".format(p))
+        lines.append("VAR x, z : INTEGER; y : REAL;")
+        lines.append("BEGIN")
+        for i in range(statements):
+            lines.append("  x := (a + {i}) * 2 - z DIV 3 + -c DIV 2;".format(i=i % 10))
+            lines.append("  y := x - a * {i} + (b - 1.5) / 2;".format(i=i % 5))
+        lines.append("  z := x")
+        lines.append("END;")
+    lines.append("BEGIN a := 3; b := 4.5; c := 7 END.")
+    return "\n".join(lines)
+
+
+def sequential(text):
+    tree = Parser(Lexer(text, regex=True), SemanticAnalyzer()).parse()
+    tree = ConstantFolder(tree).fold()
+    return tree, BytecodeCompiler(tree).compile()
+
+
+def parallel(text, workers):
+    if(workers == 0):
+        return compile_program(text)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return compile_program(text, executor)
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--procedures", type=int, default=500)
+    argparser.add_argument("--workers", type=int, nargs="+", default=sorted({0, 1, 2, 4, cpus}))
+    args = argparser.parse_args()
+
+    text = make_program(args.procedures)
+    elapsed, (_, code) = timed(sequential, text)
+    expected = disassemble(code)
+    print("{} procedures, {} lines, {} cpus".format(args.procedures, text.count("\n") + 1, cpus))
+    print("sequential      {:7.3f} s".format(elapsed))
+    for workers in args.workers:
+        seconds, code = timed(parallel, text, workers)
+        assert disassemble(code) == expected
+        print("{:>2} workers      {:7.3f} s  {:.2f}x".format(workers, seconds, elapsed / seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+""" Per-stage timings of the front end and the interpreter on generated programs.
+
+    each stage runs --repeat times on programs from bench/generate.py of
+    each size; min, median and stdev are reported with the throughput of
+    the min in tokens/s and AST nodes/s. --save writes the results as JSON,
+    --baseline compares the min times with saved results and exits with 1
+    when a stage got slower by more than --threshold.
+
+    $ python bench/bench_suite.py --save before.json
+    $ python bench/bench_suite.py --baseline before.json --threshold 0.1
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from generate import generate
+from genastdot import ASTVisualizer
+from incremental import TokenList
+from interpreter import Interpreter, SemanticAnalyzer
+from parser import Parser
+from stats import lex, walk
+
+
+
+def program_for(statements, seed, depth):
+    """ a program of `statements` statements, with the VAR sections and the
+        procedures growing with it
+    """
+    return generate(
+        seed,
+        statements=statements,
+        variables=max(16, statements // 50),
+        procedures=max(1, statements // 250),
+        nesting=3,
+        depth=depth,
+    )
+
+
+
+def stages(text):
+    """ (stage, function) to time; each function does one stage, the input is
+        made once by the earlier stages. lex and parse are the front end the
+        interpreter runs, Parser(Lexer(text)), split as stats.PipelineStats
+        does: the default Lexer run to the end, the Parser over its tokens.
+    """
+    tokens = lex(text)
+    tree = Parser(TokenList(tokens)).parse()
+    SemanticAnalyzer().visit(tree)
+    return (
+        ("lex", lambda: lex(text)),
+        ("parse", lambda: Parser(TokenList(tokens)).parse()),
+        ("analyze", lambda: SemanticAnalyzer().visit(tree)),
+        ("interpret", lambda: Interpreter(tree).interpret()),
+        ("visualize", lambda: ASTVisualizer(None).visit(tree)),
+    ), len(tokens) - 1, sum(1 for _ in walk(tree))
+
+
+
+def run(sizes, repeat, seed, depth):
+    results = []
+    for statements in sizes:
+        timed, tokens, nodes = stages(program_for(statements, seed, depth))
+        for stage, function in timed:
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                function()
+                times.append(time.perf_counter() - start)
+
+            best = min(times)
+            results.append(dict(
+                statements=statements,
+                stage=stage,
+                tokens=tokens,
+                nodes=nodes,
+                min=best,
+                median=statistics.median(times),
+                stdev=statistics.stdev(times) if repeat > 1 else 0.0,
+                tokens_per_s=tokens / best if stage in ("lex", "parse") else None,
+                nodes_per_s=nodes / best if stage != "lex" else None,
+            ))
+            print_result(results[-1])
+    return results
+
+
+
+def print_result(result):
+    throughput = []
+    if result["tokens_per_s"] is not None:
+        throughput.append("{:>8.0f} Ktok/s".format(result["tokens_per_s"] / 1e3))
+    if result["nodes_per_s"] is not None:
+        throughput.append("{:>8.0f} Knode/s".format(result["nodes_per_s"] / 1e3))
+    print("{:>8} {:<10} {:>9.4f} {:>9.4f} {:>8.4f}  {}".format(
+        result["statements"], result["stage"], result["min"], result["median"],
+        result["stdev"], "  ".join(throughput)))
+
+
+
+def compare(results, baseline, threshold):
+    """ the stages whose min time is more than threshold above the baseline's """
+    before = {(result["statements"], result["stage"]): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = before.get((result["statements"], result["stage"]))
+        if old is None:
+            continue
+        change = result["min"] / old["min"] - 1
+        marker = "REGRESSION" if change > threshold else ""
+        print("{:>8} {:<10} {:>9.4f} -> {:>9.4f} {:>+7.1%} {}".format(
+            result["statements"], result["stage"], old["min"], result["min"], change, marker))
+        if marker:
+            regressions.append(result)
+    return regressions
+
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--sizes", type=int, nargs="+", default=[500, 2000, 8000], help="statements in the main block")
+    argparser.add_argument("--repeat", type=int, default=5)
+    argparser.add_argument("--seed", type=int, default=0)
+    argparser.add_argument("--depth", type=int, default=6, help="expression nesting depth")
+    argparser.add_argument("--save", metavar="PATH", help="write the results as JSON")
+    argparser.add_argument("--baseline", metavar="PATH", help="results saved by an earlier run to compare with")
+    argparser.add_argument("--threshold", type=float, default=0.10, help="slowdown that counts as a regression, 0.10 is 10%%")
+    args = argparser.parse_args()
+
+    config = dict(sizes=args.sizes, repeat=args.repeat, seed=args.seed, depth=args.depth)
+    print("{:>8} {:<10} {:>9} {:>9} {:>8}  throughput (of the min)".format(
+        "size", "stage", "min s", "median s", "stdev"))
+    results = run(args.sizes, args.repeat, args.seed, args.depth)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(dict(python=platform.python_version(), config=config, results=results), f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if(baseline["config"]["seed"] != args.seed or baseline["config"]["depth"] != args.depth):
+            print("baseline made with other programs: {}".format(baseline["config"]))
+        if(baseline.get("python") != platform.python_version()):
+            print("baseline made with Python {}".format(baseline.get("python")))
+        print()
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("{} stage(s) slower than the baseline by more than {:.0%}".format(
+                len(regressions), args.threshold))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
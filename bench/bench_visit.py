@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+""" Per-node NodeVisitor.visit overhead on a deep expression tree.
+
+    the Interpreter evaluates expressions without visit() since they are
+    walked with an explicit stack, so the tree is walked by a visitor that
+    still calls visit() for every node and does nothing else. the two
+    dispatches are timed in turns and the best of the repeats is kept.
+
+    $ python bench/bench_visit.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from interpreter import NodeVisitor
+from parser import BinOp, Num, UnaryOp
+from tokens import Token, Tokens
+
+
+class NodeCounter(NodeVisitor):
+    """ visits every node of an expression, returns how many there are """
+    def visit_BinOp(self, node):
+        return self.visit(node.left) + self.visit(node.right) + 1
+
+    def visit_UnaryOp(self, node):
+        return self.visit(node.expr) + 1
+
+    def visit_Num(self, node):
+        return 1
+
+
+class NameDispatchCounter(NodeCounter):
+    """ the old visit(): build "visit_" + class name and getattr on every node """
+    def visit(self, node):
+        method_name = "visit_" + type(node).__name__
+        visitor = getattr(self, method_name, self.generic_visit)
+        return visitor(node)
+
+
+def deep_expression(depth):
+    """ ((((1 + -2) * 3) - -4) ...) nested `depth` BinOps deep """
+    ops = [Token(Tokens.PLUS, "+"), Token(Tokens.MUL, "*"), Token(Tokens.MINUS, "-")]
+    node = Num(Token(Tokens.INT_CONST, 1))
+    count = 1
+    for i in range(depth):
+        right = Num(Token(Tokens.INT_CONST, i % 7 + 1))
+        if i % 2:
+            right = UnaryOp(Token(Tokens.MINUS, "-"), right)
+            count += 1
+        node = BinOp(node, ops[i % 3], right)
+        count += 2
+    return node, count
+
+
+def timed(visitor, tree, count):
+    start = time.perf_counter()
+    visited = visitor.visit(tree)
+    elapsed = time.perf_counter() - start
+    assert visited == count, "visit() ran {} times for {} nodes".format(visited, count)
+    return elapsed
+
+
+def main():
+    depth = 800
+    repeat = 200
+    sys.setrecursionlimit(10 * depth)
+    tree, count = deep_expression(depth)
+    visitors = {"name dispatch": NameDispatchCounter(), "dispatch table": NodeCounter()}
+    best = dict.fromkeys(visitors, float("inf"))
+    for i in range(repeat):
+        # in turns, swapping who goes first, so warm-up favours neither
+        for name in (sorted(visitors) if i % 2 else sorted(visitors, reverse=True)):
+            best[name] = min(best[name], timed(visitors[name], tree, count))
+
+    print("{} nodes, depth {}".format(count, depth))
+    for name in visitors:
+        print("{:<15} {:6.1f} ns/node".format(name, best[name] / count * 1e9))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+""" Throughput of the bytecode VM against the AST walking Interpreter.
+
+    $ python bench/bench_vm.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_compile import make_program
+from bytecode import BytecodeCompiler, VM, disassemble
+from interpreter import Interpreter
+from lexer import Lexer
+from parser import Parser
+
+
+def main():
+    runs = 1000
+    tree = Parser(Lexer(make_program(50), regex=True)).parse()
+
+    interpreter = Interpreter(tree)
+    start = time.perf_counter()
+    for _ in range(runs):
+        interpreter.interpret()
+    walk = time.perf_counter() - start
+
+    code = BytecodeCompiler(tree).compile()
+    vm = VM()
+    start = time.perf_counter()
+    for _ in range(runs):
+        memory = vm.run(code)
+    bytecode = time.perf_counter() - start
+
+    assert memory == interpreter.GLOBAL_SCOPE
+    instructions = disassemble(code).count("\n")
+    print("{} runs, {} instructions, {} words of bytecode".format(runs, instructions, len(code.code)))
+    print("tree walk  {:7.3f} s".format(walk))
+    print("bytecode   {:7.3f} s  {:.1f}x  {:.1f} M instructions/s".format(
+        bytecode, walk / bytecode, runs * instructions / bytecode / 1e6))
+
+
+if __name__ == "__main__":
+    main()
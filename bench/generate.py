@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+""" Seeded generator of synthetic programs in the grammar.txt dialect.
+
+    the same arguments always give the same program. the programs analyze
+    and run without errors: every variable is assigned before it is read,
+    no REAL goes to an INTEGER or DIV and divisors are non-zero constants.
+    variables are read divided down (see expression()), so the values stay
+    small however long the program is.
+
+    $ python bench/generate.py --statements 1000 --seed 7 > big.pas
+"""
+import argparse
+import random
+
+
+class ProgramGenerator:
+    def __init__(self, seed=0, statements=1000, variables=16, procedures=4,
+                 nesting=2, depth=6, width=4):
+        """ statements: assignments in the main block
+            variables: global variables, half INTEGER and half REAL (a wide VAR section)
+            procedures: top-level procedures, each with `nesting` levels of
+                procedures nested in it
+            depth: nesting depth of the generated expressions
+            width: variables per line of a VAR section
+        """
+        self.random = random.Random(seed)
+        self.seed = seed
+        self.statements = statements
+        self.variables = variables
+        self.procedures = procedures
+        self.nesting = nesting
+        self.depth = depth
+        self.width = width
+
+
+    def program(self):
+        integers = ["i{}".format(n) for n in range((self.variables + 1) // 2)]
+        reals = ["r{}".format(n) for n in range(self.variables // 2)]
+        lines = ["PROGRAM Bench{};".format(self.seed)]
+        lines += self.var_section(integers, reals, "")
+        for n in range(self.procedures):
+            lines += self.procedure("P{}".format(n), self.nesting, integers, reals, "")
+
+        body = ["{} := {}".format(name, self.random.randint(1, 9)) for name in integers]
+        body += ["{} := {}.5".format(name, self.random.randint(0, 9)) for name in reals]
+        body += self.statement_list(self.statements, integers, reals)
+        lines.append("BEGIN")
+        lines.append(";\n".join("  " + statement for statement in body))
+        lines.append("END.")
+        return "\n".join(lines) + "\n"
+
+
+    def var_section(self, integers, reals, indent):
+        lines = []
+        for names, type_name in ((integers, "INTEGER"), (reals, "REAL")):
+            for start in range(0, len(names), self.width):
+                lines.append("{}    {} : {};".format(
+                    indent, ", ".join(names[start:start + self.width]), type_name))
+        return ["{}VAR".format(indent)] + lines if lines else []
+
+
+    def procedure(self, name, nesting, integers, reals, indent):
+        """ a procedure with two locals of each type, `nesting` levels deep """
+        local_integers = integers + ["{}i{}".format(name.lower(), n) for n in range(2)]
+        local_reals = reals + ["{}r{}".format(name.lower(), n) for n in range(2)]
+        lines = ["{}PROCEDURE {};".format(indent, name)]
+        lines += self.var_section(local_integers[len(integers):], local_reals[len(reals):], indent)
+        if nesting:
+            lines += self.procedure(name + "0", nesting - 1, local_integers, local_reals, indent + "  ")
+        body = self.statement_list(4, local_integers, local_reals)
+        lines.append("{}BEGIN".format(indent))
+        lines.append(";\n".join("{}  {}".format(indent, statement) for statement in body))
+        lines.append("{}END;".format(indent))
+        return lines
+
+
+    def statement_list(self, count, integers, reals):
+        statements = []
+        while(len(statements) < count):
+            if(self.random.random() < 0.05):
+                inner = self.statement_list(min(5, count - len(statements)), integers, reals)
+                statements.append("BEGIN " + "; ".join(inner) + " END")
+            else:
+                statements.append(self.assignment(integers, reals))
+        return statements
+
+
+    def assignment(self, integers, reals):
+        real = bool(reals) and self.random.random() < 0.5
+        target = self.random.choice(reals if real else integers)
+        leaves = self.random.randint(2, 2 ** self.depth // 4 + 2)
+        value = self.expression(real, integers, reals, self.depth, leaves)
+        if(self.random.random() < 0.05):
+            condition = self.expression(False, integers, [], 2, 2)
+            other = self.expression(real, integers, reals, 2, 2)
+            value = "{} ? {} : {}".format(condition, value, other)
+        return "{} := {}".format(target, value)
+
+
+    def expression(self, real, integers, reals, depth, leaves, scale=None):
+        """ an expression of the type (REAL if real) with about `leaves` leaves
+
+            variables are read as (v DIV scale) or (v / scale), scale is the
+            leaf count times the constant factors above the leaf, so the
+            expression is at most the largest variable plus a constant.
+        """
+        r = self.random
+        scale = leaves if scale is None else scale
+        if(depth == 0 or leaves <= 1):
+            if(r.random() < 0.3):
+                return "{}.{}".format(r.randint(0, 9), r.randint(1, 9)) if real else str(r.randint(1, 9))
+            if(real and r.random() < 0.7):
+                return "({} / {})".format(r.choice(reals), max(scale, 2))
+            return "({} DIV {})".format(r.choice(integers), max(scale, 2))
+
+        k = r.random()
+        if(k < 0.1):
+            return "-" + self.expression(real, integers, reals, depth - 1, leaves, scale)
+        if(k < 0.2):
+            return "(" + self.expression(real, integers, reals, depth - 1, leaves, scale) + ")"
+        if(k < 0.35):
+            constant = r.randint(2, 5)
+            factor = self.expression(real, integers, reals, depth - 1, leaves, scale * (constant + 1))
+            return "{}{} * {}".format(constant, ".5" if real else "", factor)
+        if(k < 0.45):
+            operand = self.expression(real, integers, reals, depth - 1, leaves, scale)
+            return "({}) {} {}".format(operand, "/" if real else "DIV", r.randint(2, 9))
+
+        split = r.randint(1, leaves - 1)
+        op = r.choice(("+", "-"))
+        left = self.expression(real, integers, reals, depth - 1, split, scale)
+        right = self.expression(real, integers, reals, depth - 1, leaves - split, scale)
+        if(r.random() < 0.5):
+            return "({} {} {})".format(left, op, right)
+        return "{} {} ({})".format(left, op, right)
+
+
+
+def generate(seed=0, **kwargs):
+    """ the program text for the ProgramGenerator arguments """
+    return ProgramGenerator(seed, **kwargs).program()
+
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Print a synthetic Pascal program")
+    argparser.add_argument("--seed", type=int, default=0)
+    argparser.add_argument("--statements", type=int, default=1000)
+    argparser.add_argument("--variables", type=int, default=16)
+    argparser.add_argument("--procedures", type=int, default=4)
+    argparser.add_argument("--nesting", type=int, default=2)
+    argparser.add_argument("--depth", type=int, default=6)
+    args = argparser.parse_args()
+    print(generate(**vars(args)), end="")
+
+
+if __name__ == "__main__":
+    main()
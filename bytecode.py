@@ -0,0 +1,327 @@
+from array import array
+
+from tokens import Tokens
+from parser import BinOp, UnaryOp, Num
+from interpreter import NodeVisitor, NODE_KINDS, VarSymbol, UNSET, postorder
+
+
+# opcodes. the operands follow the opcode in the same array('i')
+LOAD_CONST      = 0  # const index
+LOAD_FAST       = 1  # slot in the current frame
+STORE_FAST      = 2  # slot in the current frame
+LOAD_OUTER      = 3  # scope level, slot
+STORE_OUTER     = 4  # scope level, slot
+UNARY_NEGATIVE  = 5
+UNARY_POSITIVE  = 6
+BINARY_ADD      = 7
+BINARY_SUB      = 8
+BINARY_MUL      = 9
+BINARY_TRUEDIV  = 10
+BINARY_FLOORDIV = 11
+CALL            = 12 # procedure index
+RETURN          = 13
+JUMP_IF_FALSE   = 14 # target pc, pops the condition
+JUMP            = 15 # target pc
+TO_FLOAT        = 16 # Assign.coerce, an INTEGER assigned to a REAL
+
+OPNAMES = {
+    value: name for name, value in list(globals().items())
+    if name.isupper() and isinstance(value, int)
+}
+
+OPERAND_COUNT = {
+    LOAD_CONST: 1, LOAD_FAST: 1, STORE_FAST: 1, LOAD_OUTER: 2, STORE_OUTER: 2, CALL: 1,
+    JUMP_IF_FALSE: 1, JUMP: 1,
+}
+
+BINARY_OPS = {
+    Tokens.PLUS: BINARY_ADD,
+    Tokens.MINUS: BINARY_SUB,
+    Tokens.MUL: BINARY_MUL,
+    Tokens.FLOATDIV: BINARY_TRUEDIV,
+    Tokens.DIV: BINARY_FLOORDIV,
+}
+
+class Code:
+    """ Bytecode of a program or procedure body
+
+        level is the scope level of its frame as SemanticAnalyzer numbers
+        them: 1 for the program, 2 for a procedure declared in the program
+        and so on. names[slot] is the name of the variable in the slot.
+    """
+    def __init__(self, name, level, enclosing=None):
+        self.name = name
+        self.level = level
+        self.enclosing = enclosing
+        self.code = array("i")
+        self.consts = []
+        self.names = [] # slot -> variable name
+        self.procedures = []
+        self._consts = {}
+
+    def __str__(self):
+        return "<Code {name}, {size} words>".format(name=self.name, size=len(self.code))
+
+    __repr__ = __str__
+
+
+    def emit(self, opcode, *operands):
+        self.code.append(opcode)
+        self.code.extend(operands)
+
+
+    def const(self, value):
+        # int 1 and float 1.0 are equal dict keys, so key by type too
+        key = (type(value), value)
+        index = self._consts.get(key)
+        if(index is None):
+            index = self._consts[key] = len(self.consts)
+            self.consts.append(value)
+        return index
+
+
+
+class BytecodeCompiler(NodeVisitor):
+    """ Lowers an analyzed Program AST to Code objects
+
+        variables are loaded and stored by the (level, slot) SemanticAnalyzer
+        gave them, a frame has the slots of its block's scope.
+    """
+    def __init__(self, tree):
+        self.tree = tree
+        self.code = None
+
+
+    def compile(self):
+        return self.visit(self.tree)
+
+
+    def visit_Program(self, node):
+        return self._body(node.name, node.block)
+
+
+    def _body(self, name, block):
+        scope = block.scope
+        code = self.code = Code(name, scope.scope_level, self.code)
+        code.names = [None] * scope.slots
+        for symbol in scope._symbols.values():
+            if isinstance(symbol, VarSymbol):
+                code.names[symbol.slot] = symbol.name
+        self.visit(block)
+        code.emit(RETURN)
+
+        self.code = code.enclosing
+        return code
+
+
+    def visit_Block(self, node):
+        for declaration in node.declarations:
+            self.visit(declaration)
+        self.visit(node.compound_statement)
+
+
+    def visit_VarDecl(self, node):
+        pass
+
+
+    def visit_ProcedureDecl(self, node):
+        # procedures are compiled into the enclosing Code and run by CALL
+        procedure = self._body(node.proc_name, node.block_node)
+        self.code.procedures.append(procedure)
+
+
+    def visit_Compound(self, node):
+        for child in node.children:
+            self.visit(child)
+
+
+    def visit_NoOp(self, node):
+        pass
+
+
+    def visit_Assign(self, node):
+        self.visit(node.right)
+        if node.coerce is not None:
+            self.code.emit(TO_FLOAT)
+        level, slot = node.left.level, node.left.slot
+        if(level == self.code.level):
+            self.code.emit(STORE_FAST, slot)
+        else:
+            self.code.emit(STORE_OUTER, level, slot)
+
+
+    def visit_Var(self, node):
+        level, slot = node.level, node.slot
+        if(level == self.code.level):
+            self.code.emit(LOAD_FAST, slot)
+        else:
+            self.code.emit(LOAD_OUTER, level, slot)
+
+
+    def visit_Num(self, node):
+        self.code.emit(LOAD_CONST, self.code.const(node.value))
+
+
+    def visit_BinOp(self, node):
+        # stack code is the postorder of the expression, see interpreter.postorder()
+        code = self.code
+        for node in postorder(node):
+            cls = NODE_KINDS[node.__class__]
+            if(cls is BinOp):
+                code.emit(BINARY_OPS[node.op.type])
+            elif(cls is UnaryOp):
+                code.emit(UNARY_NEGATIVE if node.op.type == Tokens.MINUS else UNARY_POSITIVE)
+            else:
+                self.visit(node)
+
+    visit_UnaryOp = visit_BinOp
+
+
+    def visit_Ternary(self, node):
+        code = self.code
+        if(type(node.condition) is Num):
+            # not folded yet: only the selected expression is compiled
+            self.visit(node.true_expr if node.condition.value else node.false_expr)
+            return
+
+        self.visit(node.condition)
+        code.emit(JUMP_IF_FALSE, -1)
+        false_jump = len(code.code) - 1 # the operand, patched below
+        self.visit(node.true_expr)
+        code.emit(JUMP, -1)
+        end_jump = len(code.code) - 1
+        code.code[false_jump] = len(code.code)
+        self.visit(node.false_expr)
+        code.code[end_jump] = len(code.code)
+
+
+
+class VM:
+    """ Stack machine for Code objects
+
+        frames are lists indexed by slot; display[level] is the innermost
+        active frame of each scope level.
+    """
+    def run(self, code, env=None):
+        """ execute a program, return its variables like Interpreter.GLOBAL_SCOPE """
+        frame = [UNSET] * len(code.names)
+        if env:
+            for slot, name in enumerate(code.names):
+                if name in env:
+                    frame[slot] = env[name]
+
+        display = [None] * code.level # the levels below the program's are unused
+        display.append(frame)
+        self.execute(code, display)
+        return {
+            name: value for name, value in zip(code.names, frame)
+            if value is not UNSET
+        }
+
+
+    def execute(self, code, display):
+        ops = code.code
+        consts = code.consts
+        frame = display[-1]
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        pc = 0
+
+        while True:
+            op = ops[pc]
+            if(op == LOAD_FAST):
+                value = frame[ops[pc + 1]]
+                if value is UNSET:
+                    raise NameError(repr(code.names[ops[pc + 1]]))
+                push(value)
+                pc += 2
+            elif(op == LOAD_CONST):
+                push(consts[ops[pc + 1]])
+                pc += 2
+            elif(op == STORE_FAST):
+                frame[ops[pc + 1]] = pop()
+                pc += 2
+            elif(op == BINARY_ADD):
+                right = pop()
+                stack[-1] = stack[-1] + right
+                pc += 1
+            elif(op == BINARY_SUB):
+                right = pop()
+                stack[-1] = stack[-1] - right
+                pc += 1
+            elif(op == BINARY_MUL):
+                right = pop()
+                stack[-1] = stack[-1] * right
+                pc += 1
+            elif(op == BINARY_TRUEDIV):
+                right = pop()
+                stack[-1] = stack[-1] / right # float DIV
+                pc += 1
+            elif(op == BINARY_FLOORDIV):
+                right = pop()
+                stack[-1] = stack[-1] // right
+                pc += 1
+            elif(op == UNARY_NEGATIVE):
+                stack[-1] = -stack[-1]
+                pc += 1
+            elif(op == UNARY_POSITIVE):
+                stack[-1] = +stack[-1]
+                pc += 1
+            elif(op == TO_FLOAT):
+                stack[-1] = float(stack[-1])
+                pc += 1
+            elif(op == JUMP_IF_FALSE):
+                if pop():
+                    pc += 2
+                else:
+                    pc = ops[pc + 1]
+            elif(op == JUMP):
+                pc = ops[pc + 1]
+            elif(op == LOAD_OUTER):
+                value = display[ops[pc + 1]][ops[pc + 2]]
+                if value is UNSET:
+                    raise NameError("outer slot {}".format(ops[pc + 2]))
+                push(value)
+                pc += 3
+            elif(op == STORE_OUTER):
+                display[ops[pc + 1]][ops[pc + 2]] = pop()
+                pc += 3
+            elif(op == CALL):
+                procedure = code.procedures[ops[pc + 1]]
+                callee = display[:procedure.level]
+                callee.append([UNSET] * len(procedure.names))
+                self.execute(procedure, callee)
+                pc += 2
+            elif(op == RETURN):
+                return
+            else:
+                raise Exception("Bad opcode {} at {}".format(op, pc))
+
+
+
+def disassemble(code, indent=""):
+    """ readable listing of a Code object and its procedures """
+    lines = ["{indent}{code} level {level}, slots {names}".format(
+        indent=indent, code=code, level=code.level, names=code.names)]
+    ops = code.code
+    pc = 0
+    while(pc < len(ops)):
+        op = ops[pc]
+        operands = list(ops[pc + 1:pc + 1 + OPERAND_COUNT.get(op, 0)])
+        note = ""
+        if(op == LOAD_CONST):
+            note = "({!r})".format(code.consts[operands[0]])
+        elif(op in (LOAD_FAST, STORE_FAST)):
+            note = "({})".format(code.names[operands[0]])
+        elif(op == CALL):
+            note = "({})".format(code.procedures[operands[0]].name)
+        lines.append("{indent}{pc:>6} {name:<16}{operands:<8}{note}".format(
+            indent=indent, pc=pc, name=OPNAMES[op],
+            operands=" ".join(str(operand) for operand in operands), note=note))
+        pc += 1 + len(operands)
+
+    for procedure in code.procedures:
+        lines.append("")
+        lines.append(disassemble(procedure, indent + "    "))
+    return "\n".join(lines)
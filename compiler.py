@@ -0,0 +1,155 @@
+from tokens import Tokens
+from parser import NoOp, Num
+from interpreter import NodeVisitor, VarSymbol, UNSET
+
+
+
+class CompiledProgram:
+    """ A program compiled to closures, run it any number of times
+
+        every closure takes the frame, a list with one slot per variable,
+        names[slot] the name of the variable in the slot.
+    """
+    def __init__(self, code, names):
+        self.code = code
+        self.names = names
+        self.slots = {name: slot for slot, name in enumerate(names)}
+
+    def run(self, env=None):
+        """ execute with the variables in `env` preset, return the memory dict """
+        frame = [UNSET] * len(self.names)
+        if env:
+            for name, value in env.items():
+                slot = self.slots.get(name)
+                if slot is not None:
+                    frame[slot] = value
+
+        self.code(frame)
+        return {
+            name: value for name, value in zip(self.names, frame)
+            if value is not UNSET
+        }
+
+
+
+class ClosureCompiler(NodeVisitor):
+    """ Turns an analyzed AST into a tree of pre-bound closures
+
+        operators and constants are resolved here, once, the variables are
+        read from the slots SemanticAnalyzer gave them; CompiledProgram.run()
+        then gives the same memory as Interpreter.interpret() leaves in
+        GLOBAL_SCOPE. only the main block is compiled and procedures are
+        never called, so every variable is in the program's frame.
+    """
+    def __init__(self, tree):
+        self.tree = tree
+        self.names = []
+
+
+    def compile(self):
+        code = self.visit(self.tree)
+        return CompiledProgram(code, self.names)
+
+
+    def visit_Program(self, node):
+        scope = node.block.scope
+        self.names = [None] * scope.slots
+        for symbol in scope._symbols.values():
+            if isinstance(symbol, VarSymbol):
+                self.names[symbol.slot] = symbol.name
+        return self.visit(node.block)
+
+
+    def visit_Block(self, node):
+        # declarations don't execute
+        return self.visit(node.compound_statement)
+
+
+    def visit_Compound(self, node):
+        statements = tuple(
+            self.visit(child) for child in node.children
+            if not isinstance(child, NoOp)
+        )
+
+        def compound(frame):
+            for statement in statements:
+                statement(frame)
+
+        return compound
+
+
+    def visit_NoOp(self, node):
+        def noop(frame):
+            pass
+
+        return noop
+
+
+    def visit_Assign(self, node):
+        slot = node.left.slot
+        right = self.visit(node.right)
+        coerce = node.coerce
+
+        if coerce is not None:
+            def assign(frame):
+                frame[slot] = coerce(right(frame))
+        else:
+            def assign(frame):
+                frame[slot] = right(frame)
+
+        return assign
+
+
+    def visit_Var(self, node):
+        name = node.value
+        slot = node.slot
+
+        def var(frame):
+            value = frame[slot]
+            if value is UNSET:
+                raise NameError(repr(name))
+            return value
+
+        return var
+
+
+    def visit_Num(self, node):
+        value = node.value
+        return lambda frame: value
+
+
+    def visit_Ternary(self, node):
+        if(type(node.condition) is Num):
+            # not folded yet: only the selected expression is compiled
+            return self.visit(node.true_expr if node.condition.value else node.false_expr)
+
+        condition = self.visit(node.condition)
+        true_expr = self.visit(node.true_expr)
+        false_expr = self.visit(node.false_expr)
+        return lambda frame: true_expr(frame) if condition(frame) else false_expr(frame)
+
+
+    def visit_UnaryOp(self, node):
+        expr = self.visit(node.expr)
+        if(node.op.type == Tokens.MINUS):
+            return lambda frame: -expr(frame)
+        return lambda frame: +expr(frame)
+
+
+    def visit_BinOp(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        op = node.op.type
+
+        if(op == Tokens.PLUS):
+            return lambda frame: left(frame) + right(frame)
+        elif(op == Tokens.MINUS):
+            return lambda frame: left(frame) - right(frame)
+        elif(op == Tokens.MUL):
+            return lambda frame: left(frame) * right(frame)
+        elif(op == Tokens.FLOATDIV):
+            return lambda frame: left(frame) / right(frame) # float DIV
+        elif(op == Tokens.DIV):
+            return lambda frame: left(frame) // right(frame)
+
+        raise Exception("Unknown operator {}".format(node.op))
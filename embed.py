@@ -0,0 +1,154 @@
+import threading
+from collections import OrderedDict
+
+from tokens import Tokens
+from lexer import Lexer
+from parser import Parser, BinOp, UnaryOp, Ternary, Var
+from optimizer import ConstantFolder
+from interpreter import Interpreter, NODE_KINDS, UNSET
+from compiler import ClosureCompiler
+
+
+class Expression:
+    """ An expression compiled to closures, call it with the variables """
+    __slots__ = ("code", "names")
+
+    def __init__(self, code, names):
+        self.code = code
+        self.names = names
+
+    def __call__(self, env=None):
+        env = env or {}
+        return self.code([env.get(name, UNSET) for name in self.names])
+
+
+
+def compile_expression(text):
+    """ parse, fold and compile an expression like "a * (b + 2)" or "a ? b : 2" """
+    parser = Parser(Lexer(text))
+    tree = parser.conditional()
+    if parser.current_token.type != Tokens.EOF:
+        parser.error()
+
+    tree = ConstantFolder(tree).fold()
+    names = _bind(tree)
+    try:
+        code = ClosureCompiler(tree).visit(tree)
+    except RecursionError:
+        # closures nest as deep as the expression, this one is evaluated
+        # by Interpreter.evaluate() with its explicit stack instead
+        code = _evaluator(tree)
+    return Expression(code, names)
+
+
+
+def _evaluator(tree):
+    """ code for Expression that evaluates tree without recursion, slower than closures """
+    def evaluate(frame):
+        interpreter = Interpreter(None) # one per call, an Expression is shared between threads
+        interpreter.display = [frame]
+        return interpreter.evaluate(tree)
+
+    return evaluate
+
+
+
+def _bind(tree):
+    """ give every Var of an expression a slot by its name, return the names by slot
+
+        an expression has no declarations for SemanticAnalyzer to resolve,
+        its variables are the names of the env it is called with.
+    """
+    slots = {}
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        cls = NODE_KINDS[node.__class__]
+        if(cls is Var):
+            node.level = 0
+            node.slot = slots.setdefault(node.value, len(slots))
+        elif(cls is BinOp):
+            stack.extend((node.right, node.left))
+        elif(cls is UnaryOp):
+            stack.append(node.expr)
+        elif(cls is Ternary):
+            stack.extend((node.false_expr, node.true_expr, node.condition))
+    return list(slots)
+
+
+
+class ExpressionCache:
+    """ Bounded LRU of compiled expressions by source text
+
+        get() compiles on a miss; once there are more than capacity entries
+        the least recently used one is dropped. safe to share between
+        threads: the entries and counters change under a lock, compiling
+        runs outside it, two threads missing the same text may both compile
+        it and get the first one stored.
+    """
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+    def get(self, text):
+        entries = self.entries
+        with self.lock:
+            expression = entries.get(text)
+            if expression is not None:
+                self.hits += 1
+                entries.move_to_end(text)
+                return expression
+            self.misses += 1
+
+        compiled = compile_expression(text)
+        with self.lock:
+            expression = entries.setdefault(text, compiled)
+            if(len(entries) > self.capacity):
+                entries.popitem(last=False)
+                self.evictions += 1
+        return expression
+
+
+    def invalidate(self, text=None):
+        """ forget the expression for text, or every expression """
+        with self.lock:
+            if text is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(text, None)
+
+
+    def stats(self):
+        with self.lock:
+            return dict(
+                size=len(self.entries),
+                capacity=self.capacity,
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+            )
+
+
+
+# used by evaluate() unless it is given a cache
+default_cache = ExpressionCache()
+
+
+
+def evaluate(text, env=None, cache=None):
+    """ the value of the expression text with its variables taken from env
+
+        evaluate("x * 2 + 1", {"x": 20}) == 41. the compiled expression is
+        kept in the cache (default_cache if None) for the next call.
+    """
+    if cache is None:
+        cache = default_cache
+    return cache.get(text)(env)
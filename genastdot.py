@@ -27,24 +27,67 @@ class ASTVisualizer(NodeVisitor):
         self.dot_body = []
         self.dot_footer = ['}']
 
-    def visit_Num(self, node):
-        s = '  node{} [label="{}"]\n'.format(self.ncount, node.token.value)
+    def _node(self, label):
+        num = self.ncount
+        s = '  node{} [label="{}"]\n'.format(num, label)
         self.dot_body.append(s)
-        node._num = self.ncount
         self.ncount += 1
+        return num
 
-    def visit_BinOp(self, node):
-        s = '  node{} [label="{}"]\n'.format(self.ncount, node.op.value)
-        self.dot_body.append(s)
-        node._num = self.ncount
-        self.ncount += 1
+    def _edges(self, num, children):
+        # AST nodes are slotted, so each visit returns the DOT node number
+        for child in children:
+            s = '  node{} -> node{}\n'.format(num, self.visit(child))
+            self.dot_body.append(s)
+        return num
 
-        self.visit(node.left)
-        self.visit(node.right)
+    def visit_Program(self, node):
+        num = self._node('Program:{}'.format(node.name))
+        return self._edges(num, [node.block])
 
-        for child_node in (node.left, node.right):
-            s = '  node{} -> node{}\n'.format(node._num, child_node._num)
-            self.dot_body.append(s)
+    def visit_Block(self, node):
+        num = self._node('Block')
+        return self._edges(num, node.declarations + [node.compound_statement])
+
+    def visit_VarDecl(self, node):
+        num = self._node('VarDecl')
+        return self._edges(num, [node.var_node, node.type_node])
+
+    def visit_Type(self, node):
+        return self._node(node.token.value)
+
+    def visit_ProcedureDecl(self, node):
+        num = self._node('ProcDecl:{}'.format(node.proc_name))
+        return self._edges(num, [node.block_node])
+
+    def visit_Compound(self, node):
+        num = self._node('Compound')
+        return self._edges(num, node.children)
+
+    def visit_Assign(self, node):
+        num = self._node(node.op.value)
+        return self._edges(num, [node.left, node.right])
+
+    def visit_Ternary(self, node):
+        num = self._node('?:')
+        return self._edges(num, [node.condition, node.true_expr, node.false_expr])
+
+    def visit_Var(self, node):
+        return self._node(node.value)
+
+    def visit_NoOp(self, node):
+        return self._node('NoOp')
+
+    def visit_Num(self, node):
+        return self._node(node.token.value)
+
+    def visit_UnaryOp(self, node):
+        num = self._node('unary {}'.format(node.op.value))
+        return self._edges(num, [node.expr])
+
+    def visit_BinOp(self, node):
+        num = self._node(node.op.value)
+        return self._edges(num, [node.left, node.right])
 
     def gendot(self):
         tree = self.parser.parse()
@@ -57,11 +100,12 @@ def main():
         description='Generate an AST DOT file.'
     )
     argparser.add_argument(
-        'text',
-        help='Arithmetic expression (in quotes): "1 + 2 * 3"'
+        'fname',
+        help='Pascal source file'
     )
     args = argparser.parse_args()
-    text = args.text
+    with open(args.fname) as f:
+        text = f.read()
 
     lexer = Lexer(text)
     parser = Parser(lexer)
@@ -0,0 +1,306 @@
+import itertools
+from bisect import bisect_left
+
+from tokens import Tokens
+from lexer import Lexer
+from parser import Parser
+
+
+def _offset(token):
+    return token.offset
+
+
+
+def relex(tokens, text, offset, deleted, inserted, symbols=None):
+    """ tokens for text with text[offset:offset + deleted] replaced by inserted
+
+        only the damaged region is scanned again: from the token before the
+        edit (it may grow into it, "ab" + "c" or ":" + "=") until a new token
+        starts where an old one, moved by the edit, starts. the lexer is in
+        the same state there, so the rest of the old tokens are kept and
+        moved in place.
+        the tokens list is updated in place. returns (new_text, start, stop):
+        tokens[start:stop] are the scanned tokens.
+    """
+    new_text = text[:offset] + inserted + text[offset + deleted:]
+    delta = len(inserted) - deleted
+
+    lexer = Lexer(new_text, regex=True, symbols=symbols)
+    start = bisect_left(tokens, offset, key=_offset) - 1
+    if(start >= 0):
+        first = tokens[start]
+        line, scan_from = first.line, first.offset
+        lexer.seek(first.offset, first.line, first.column)
+    else:
+        start, line, scan_from = 0, 1, 0 # the edit is before the first token
+
+    relexed = []
+    k = bisect_left(tokens, offset + deleted, lo=start, key=_offset)
+    while True:
+        token = lexer.get_next_token()
+        while(k < len(tokens) and tokens[k].offset + delta < token.offset):
+            k += 1
+        if(k < len(tokens) and tokens[k].offset + delta == token.offset):
+            break # back in step, tokens[k] is the same token as `token`
+        relexed.append(token)
+        if(token.type == Tokens.EOF):
+            break
+
+    line_delta = inserted.count("\n") - text.count("\n", offset, offset + deleted)
+    end_line = line + text.count("\n", scan_from, offset + deleted)
+    if delta:
+        for token in itertools.islice(tokens, k, None):
+            token.offset += delta
+    if(delta or line_delta):
+        # on the line the edit ends on, the columns move too
+        for token in itertools.islice(tokens, k, None):
+            if(token.line != end_line):
+                break
+            token.column = token.offset - new_text.rfind("\n", 0, token.offset)
+    if line_delta:
+        for token in itertools.islice(tokens, k, None):
+            token.line += line_delta
+
+    tokens[start:k] = relexed
+    return new_text, start, start + len(relexed)
+
+
+
+class TokenList:
+    """ get_next_token() over a list of tokens, staying on the last (EOF) one
+
+        error: what the lexer raised after the tokens, raised when the token
+        after them is asked for, when a lexer read by the parser would have.
+    """
+    def __init__(self, tokens, error=None):
+        self.tokens = tokens
+        self.error = error
+        self.current = -1 # index of the token returned last
+
+    def get_next_token(self):
+        if(self.current < len(self.tokens) - 1):
+            self.current += 1
+        elif self.error is not None:
+            raise self.error
+        return self.tokens[self.current]
+
+
+
+class _Span:
+    """ a node of the last parse, its length in tokens and the spans in it """
+    __slots__ = ("node", "length", "children")
+
+    def __init__(self, node, length, children):
+        self.node = node
+        self.length = length
+        self.children = children
+
+
+
+class _ListSpan:
+    """ a statement_list of the last parse
+
+        statement i has the tokens from starts[i] up to its lookahead token
+        ends[i], counted from the first token of the list.
+    """
+    __slots__ = ("nodes", "starts", "ends", "spans", "length")
+
+    def __init__(self, nodes, starts, ends, spans, length):
+        self.nodes = nodes
+        self.starts = starts
+        self.ends = ends
+        self.spans = spans
+        self.length = length
+
+
+
+class IncrementalParser(Parser):
+    """ Parser for a text buffer that is edited and parsed again
+
+        edit(offset, deleted, inserted) applies a text edit and returns the
+        new tree, the same tree Parser(Lexer(text)).parse() gives. tokens
+        outside the damaged region are kept (see relex()) and so are the
+        statements, compound statements and procedure declarations that
+        neither contain a scanned token nor end right before one (the parser
+        looked at the token after them). a kept subtree is the old node
+        object itself. the statements of a list before and after the damage
+        are taken over in two slices, so an edit costs about the same in a
+        long list as in a short one.
+
+        the trees are not analyzed: run SemanticAnalyzer on the result.
+        an edit that doesn't scan or parse raises what the full parse raises
+        (a syntax error before an invalid character is the syntax error),
+        but the text is edited all the same; after an invalid character the
+        next edit scans the whole text again.
+    """
+    def __init__(self, text):
+        self.text = text
+        self.symbols = {}
+        self.analyzer = None
+        self.tokens = None
+        self.tree = None
+        self.spans = {}
+        self.reused = 0 # subtrees kept by the last parse
+        self._old = self._new = None
+        self._damage = (0, 0)
+        self._shift = 0 # tokens after the damage moved by this many places
+        self._full()
+
+
+    def _full(self):
+        self.tokens = None
+        self.spans = {}
+        lexer = Lexer(self.text, regex=True, symbols=self.symbols)
+        tokens = []
+        try:
+            tokens.extend(lexer)
+            tokens.append(lexer.get_next_token()) # EOF
+        except Exception as e: # an invalid character, for the parser to reach
+            return self._parse(tokens, 0, len(tokens), error=e)
+        return self._parse(tokens, 0, len(tokens))
+
+
+    def edit(self, offset, deleted, inserted):
+        if(self.tokens is None):
+            self.text = self.text[:offset] + inserted + self.text[offset + deleted:]
+            return self._full()
+
+        tokens = self.tokens
+        count = len(tokens)
+        try:
+            self.text, start, stop = relex(
+                tokens, self.text, offset, deleted, inserted, self.symbols)
+        except Exception:
+            # an invalid character: the full parse raises what Parser would
+            self.text = self.text[:offset] + inserted + self.text[offset + deleted:]
+            return self._full()
+
+        return self._parse(tokens, start, stop, len(tokens) - count)
+
+
+    def _parse(self, tokens, start, stop, shift=0, error=None):
+        self.tokens = None if error is not None else tokens
+        self._damage = (start, stop)
+        self._shift = shift
+        self._old = self.spans
+        self._new = {}
+        self.reused = 0
+        self.lexer = TokenList(tokens, error)
+        try:
+            self.current_token = self.lexer.get_next_token()
+            self.tree = self.parse()
+        except Exception:
+            self.tree = None
+            self.spans = {}
+            raise
+
+        self.spans = self._new
+        return self.tree
+
+
+    def _skip(self, index):
+        """ continue at the token tokens[index] """
+        self.lexer.current = index - 1
+        self.current_token = self.lexer.get_next_token()
+
+
+    def _span(self, old, parse):
+        """ (node, span) for the node at the current token: old's if it is intact,
+            else parse() with the old node's spans to reuse from
+        """
+        index = self.lexer.current
+        if old is not None:
+            start, stop = self._damage
+            if(index >= stop or index + old.length < start):
+                self._skip(index + old.length)
+                self.reused += 1
+                return old.node, old
+
+        outer_old, outer_new = self._old, self._new
+        self._old = {} if old is None else old.children
+        self._new = children = {}
+        try:
+            node = parse()
+        finally:
+            self._old, self._new = outer_old, outer_new
+
+        return node, _Span(node, self.lexer.current - index, children)
+
+
+    def _reuse(self, kind, parse):
+        key = (self.current_token, kind)
+        node, span = self._span(self._old.get(key), parse)
+        self._new[key] = span
+        return node
+
+
+    def statement_list(self):
+        """ statement_list with the old statements before and after the damage copied """
+        key = (None, "list") # the one list of the enclosing compound statement
+        old = self._old.get(key)
+        start, stop = self._damage
+        shift = self._shift
+        base = self.lexer.current
+        old_base = base if base <= start else base - shift
+
+        nodes, starts, ends, spans = [], [], [], []
+        if old is not None and old_base < start:
+            # the statements looked at no damaged token, nor did the parser after them
+            m = bisect_left(old.ends, start - old_base)
+            if m:
+                nodes = old.nodes[:m]
+                starts = old.starts[:m]
+                ends = old.ends[:m]
+                spans = old.spans[:m]
+                self.reused += m
+                self._skip(base + ends[-1])
+                if self.current_token.type != Tokens.SEMI:
+                    # the whole list is before the damage
+                    self._new[key] = _ListSpan(nodes, starts, ends, spans, ends[-1])
+                    return nodes
+                self.eat(Tokens.SEMI)
+
+        while True:
+            index = self.lexer.current
+            span = None
+            if old is not None:
+                if(index < start):
+                    position = index - old_base
+                elif(index >= stop):
+                    position = index - shift - old_base
+                else:
+                    position = None
+
+                j = -1 if position is None else bisect_left(old.starts, position)
+                if(0 <= j < len(old.starts) and old.starts[j] == position):
+                    if(index >= stop):
+                        # past the damage the rest of the list is the old one
+                        move = index - base - position
+                        nodes += old.nodes[j:]
+                        spans += old.spans[j:]
+                        starts += [s + move for s in old.starts[j:]] if move else old.starts[j:]
+                        ends += [e + move for e in old.ends[j:]] if move else old.ends[j:]
+                        self.reused += len(old.nodes) - j
+                        self._skip(base + old.length + move)
+                        break
+                    span = old.spans[j]
+
+            node, span = self._span(span, self.statement)
+            nodes.append(node)
+            spans.append(span)
+            starts.append(index - base)
+            ends.append(self.lexer.current - base)
+            if self.current_token.type != Tokens.SEMI:
+                break
+            self.eat(Tokens.SEMI)
+
+        self._new[key] = _ListSpan(nodes, starts, ends, spans, self.lexer.current - base)
+        return nodes
+
+
+    def compound_statement(self):
+        return self._reuse("compound", super().compound_statement)
+
+
+    def procedure_declaration(self):
+        return self._reuse("procedure", super().procedure_declaration)
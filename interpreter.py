@@ -1,10 +1,89 @@
-#!/usr/bin/env python3
-
 from tokens import Tokens
 from lexer import Lexer
 from parser import Parser
+from parser import AST
+from parser import Program
+from parser import UnaryOp
+from parser import BinOp
+from parser import Num
+from parser import Var
+from parser import Ternary
+
+import operator
+from collections import defaultdict
+from time import perf_counter_ns
+
+
+# operation for each operator. SemanticAnalyzer checks the operand types and
+# stores it as node.impl; python's int and float share these functions, so
+# there is one per operator, not one per operand type
+BINARY_OPERATORS = {
+    Tokens.PLUS: operator.add,
+    Tokens.MINUS: operator.sub,
+    Tokens.MUL: operator.mul,
+    Tokens.FLOATDIV: operator.truediv,
+    Tokens.DIV: operator.floordiv,
+}
+
+UNARY_OPERATORS = {
+    Tokens.PLUS: operator.pos,
+    Tokens.MINUS: operator.neg,
+}
+
+
+
+def _ast_classes(cls):
+    """ all subclasses of an AST class """
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from _ast_classes(subclass)
+
+
+
+class _NodeKinds(dict):
+    """ parser AST class by node class: a node class is its own kind, a
+        subclass (an ASTArena view) is the kind of the AST class it derives from
+    """
+    def __missing__(self, cls):
+        kind = cls
+        for klass in cls.__mro__:
+            if(klass.__module__ == AST.__module__ and issubclass(klass, AST)):
+                kind = klass
+                break
+        self[cls] = kind
+        return kind
+
+
+# the explicit-stack walks compare node classes with `is`, through this table
+NODE_KINDS = _NodeKinds()
+
+
+
+def postorder(node):
+    """ the nodes of an expression, the operands of a BinOp or UnaryOp before it
+
+        walks the tree with an explicit stack, not recursion, so the depth of
+        the expression is limited by memory only. only BinOp and UnaryOp are
+        descended into, any other node is yielded as an operand.
+    """
+    kinds = NODE_KINDS
+    stack = [node]
+    pop, push = stack.pop, stack.append
+    while stack:
+        node = pop()
+        cls = kinds[node.__class__]
+        if(cls is BinOp):
+            push((node,)) # the node itself, once its operands are done
+            push(node.right)
+            push(node.left)
+        elif(cls is UnaryOp):
+            push((node,))
+            push(node.expr)
+        elif(cls is tuple):
+            yield node[0]
+        else:
+            yield node
 
-import sys
 
 
 class Symbol:
@@ -30,6 +109,9 @@ class ButiltinTypeSymbol(Symbol):
 class VarSymbol(Symbol):
     def __init__(self, name, type):
         super().__init__(name, type)
+        # where the variable lives at run time, set by ScopedSymbolTable.insert
+        self.level = None
+        self.slot = None
 
     def __str__(self):
         return "<{class_name}(name={name}, type={type})>".format(
@@ -41,9 +123,77 @@ class VarSymbol(Symbol):
     __repr__ = __str__
 
 
-class SymbolTable:
+class SymbolTracer:
+    """ Hook for symbol table events, pass one as SymbolTable(tracer=...)
+
+        tables without a tracer don't time or report anything. spi.py has
+        the same hooks and tracers, keep the two in sync.
+    """
+    def define(self, table, symbol):
+        pass
+
+    def lookup(self, table, name, symbol, elapsed_ns):
+        """ symbol is None on a miss """
+        pass
+
+
+
+class PrintTracer(SymbolTracer):
+    """ prints every define and lookup """
+    def define(self, table, symbol):
+        print("Define: %s" % symbol)
+
+    def lookup(self, table, name, symbol, elapsed_ns):
+        print("lookup: %s" % name)
+
+
+
+def scope_path(scope):
+    """ the scope's name after the names of the scopes around it, "global.P1.P2"
+
+        a table without a scope name (a SymbolTable) is "global".
+    """
+    names = []
+    while scope is not None:
+        names.append(getattr(scope, "scope_name", "global"))
+        scope = getattr(scope, "enclosing_scope", None)
+    return ".".join(reversed(names))
+
+
+
+class SymbolStats(SymbolTracer):
+    """ counts defines, lookups, hits and misses and lookup time per scope,
+        by scope_path(): procedures of the same name in different scopes
+        are counted apart
+    """
     def __init__(self):
+        self.scopes = defaultdict(lambda: dict(defines=0, lookups=0, hits=0, misses=0, lookup_ns=0))
+
+    def __str__(self):
+        return "\n".join(
+            "{scope}: {defines} defines, {lookups} lookups ({hits} hits, {misses} misses), {lookup_ns} ns".format(
+                scope=scope, **counts)
+            for scope, counts in self.scopes.items()
+        )
+
+    __repr__ = __str__
+
+
+    def define(self, table, symbol):
+        self.scopes[scope_path(table)]["defines"] += 1
+
+    def lookup(self, table, name, symbol, elapsed_ns):
+        counts = self.scopes[scope_path(table)]
+        counts["lookups"] += 1
+        counts["hits" if symbol is not None else "misses"] += 1
+        counts["lookup_ns"] += elapsed_ns
+
+
+
+class SymbolTable:
+    def __init__(self, tracer=None):
         self._symbols = dict()
+        self.tracer = tracer
         self.init_builtins()
 
     def __str__(self):
@@ -59,29 +209,136 @@ class SymbolTable:
 
 
 
-    # old method. Don't know what the fuck this guy is doing? I've not been in the mood this week!
     def define(self, symbol):
-        print("Define: %s" % symbol)
-        self._symbols[symbol.name] = symbol
+        self.insert(symbol)
 
 
     def insert(self, symbol):
-        print("Define: %s" % symbol)
+        if self.tracer is not None:
+            self.tracer.define(self, symbol)
         self._symbols[symbol.name] = symbol
 
 
     def lookup(self, name):
-        print("lookup: %s" % name)
-        return self._symbols.get(name)
+        if self.tracer is None:
+            return self._symbols.get(name)
+
+        start = perf_counter_ns()
+        symbol = self._symbols.get(name)
+        self.tracer.lookup(self, name, symbol, perf_counter_ns() - start)
+        return symbol
+
+
+
+class ProcedureSymbol(Symbol):
+    def __init__(self, name):
+        super().__init__(name)
+
+    def __str__(self):
+        return "<{class_name}(name={name})>".format(class_name=self.__class__.__name__, name=self.name)
+
+    __repr__ = __str__
+
+
+
+class ScopedSymbolTable(SymbolTable):
+    """ Symbols of one scope, linked to the scope around it
+
+        the outermost scope also holds the builtin types. every VarSymbol
+        inserted gets the scope level and the next free slot of the scope, its
+        index in the run time frame of size `slots`. nested scopes share the
+        tracer of the enclosing scope.
+    """
+    def __init__(self, scope_name, scope_level, enclosing_scope=None, tracer=None):
+        self._symbols = dict()
+        self.scope_name = scope_name
+        self.scope_level = scope_level
+        self.enclosing_scope = enclosing_scope
+        if tracer is None and enclosing_scope is not None:
+            tracer = enclosing_scope.tracer
+        self.tracer = tracer
+        self.slots = 0
+        if enclosing_scope is None:
+            self.init_builtins()
+
+    def __str__(self):
+        s = "Scope(name={name}, level={level}) Symbols:{symbols}".format(
+            name=self.scope_name,
+            level=self.scope_level,
+            symbols=[value for value in self._symbols.values()]
+        )
+        return s
+
+    __repr__ = __str__
+
+
+    def insert(self, symbol):
+        if isinstance(symbol, VarSymbol):
+            symbol.level = self.scope_level
+            symbol.slot = self.slots
+            self.slots += 1
+        super().insert(symbol)
+
+    define = insert
+
+
+    def lookup(self, name, current_scope_only=False):
+        """ the symbol for name in this scope or, unless current_scope_only, the nearest enclosing one """
+        symbol = super().lookup(name)
+        if symbol is not None or current_scope_only:
+            return symbol
+
+        if self.enclosing_scope is not None:
+            return self.enclosing_scope.lookup(name)
+
+        return None
 
 
 
 
 class NodeVisitor:
+    """ visit(node) calls self.visit_<NodeClass>(node)
+
+        the method is looked up once per visitor class and node class and kept
+        in the class' _dispatch table. methods for the parser's AST classes are
+        resolved when the visitor class is created; other node classes (AST
+        subclasses) are resolved through their MRO on first visit. only class
+        attributes count: a visit_X set on an instance is never called,
+        override it in a subclass instead.
+        spi.py has a copy of this class and _ast_classes(), to stay a single
+        file; a change to one has to be made to the other.
+    """
+    _dispatch = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._dispatch = {}
+        for node_class in _ast_classes(AST):
+            method = getattr(cls, "visit_" + node_class.__name__, None)
+            if method is not None:
+                cls._dispatch[node_class] = method
+
+
     def visit(self, node):
-        method_name = "visit_" + type(node).__name__
-        visitor = getattr(self, method_name, self.generic_visit)
-        return visitor(node)
+        try:
+            visitor = self._dispatch[node.__class__]
+        except KeyError:
+            visitor = self._resolve(node.__class__)
+        return visitor(self, node)
+
+
+    @classmethod
+    def _resolve(cls, node_class):
+        for klass in node_class.__mro__:
+            method = getattr(cls, "visit_" + klass.__name__, None)
+            if method is not None:
+                break
+        else:
+            method = cls.generic_visit
+
+        cls._dispatch[node_class] = method
+        return method
+
 
     def generic_visit(self, node):
         raise Exception('No visit_{} method'.format(type(node).__name__))
@@ -90,15 +347,117 @@ class NodeVisitor:
 
 
 class SemanticAnalyzer(NodeVisitor):
-    def __init__(self):
-        self.symtab = SymbolTable()
+    """ Builds the scopes, resolves every variable and types every expression
+
+        each Block gets its ScopedSymbolTable as node.scope, each Var, the
+        assignment targets included, gets its symbol and the (level, slot) of
+        the symbol and each BinOp and UnaryOp gets its static type name
+        (INTEGER or REAL) and its operation as node.impl. an Assign of an
+        INTEGER to a REAL gets node.coerce. a REAL assigned to an INTEGER or a DIV of a REAL is a TypeError.
+
+        the visit methods drive the steps below (enter_scope, declare,
+        resolve, infer...), a Parser given the analyzer calls them itself as
+        it builds the nodes. either way the operands are done before the
+        operator.
+    """
+    def __init__(self, tracer=None):
+        self.symtab = None # the global scope, once visited
+        self.current_scope = None
+        self.tracer = tracer
+
+
+    def enter_scope(self, name):
+        if self.current_scope is None:
+            self.symtab = self.current_scope = ScopedSymbolTable(name, 1, tracer=self.tracer)
+        else:
+            self.current_scope = ScopedSymbolTable(
+                name,
+                self.current_scope.scope_level + 1,
+                self.current_scope
+            )
+
+
+    def leave_scope(self):
+        self.current_scope = self.current_scope.enclosing_scope
+
+
+    def declare(self, node):
+        """ insert the symbol of a VarDecl into the current scope """
+        type_name = node.type_node.value
+        type_symbol = self.current_scope.lookup(type_name)
+        var_name = node.var_node.value
+        if self.current_scope.lookup(var_name, current_scope_only=True) is not None:
+            raise NameError("Duplicate identifier {}".format(repr(var_name)))
+
+        var_symbol = VarSymbol(var_name, type_symbol)
+        self.current_scope.insert(var_symbol)
+        node.var_node.symbol = var_symbol
+
+
+    def declare_procedure(self, name):
+        """ insert a ProcedureSymbol and enter the procedure's scope """
+        self.current_scope.insert(ProcedureSymbol(name))
+        self.enter_scope(name)
+
+
+    def resolve(self, node):
+        """ annotate a Var with its symbol and frame slot """
+        var_name = node.value
+        var_symbol = self.current_scope.lookup(var_name)
+        if not isinstance(var_symbol, VarSymbol):
+            raise NameError(repr(var_name))
+
+        node.symbol = var_symbol
+        node.level = var_symbol.level
+        node.slot = var_symbol.slot
+
+
+    def infer(self, node):
+        """ annotate a BinOp, UnaryOp or Ternary whose operands are annotated """
+        if isinstance(node, Ternary):
+            choices = (node.true_expr.type, node.false_expr.type)
+            node.type = "REAL" if "REAL" in choices else "INTEGER"
+            return
+
+        if isinstance(node, UnaryOp):
+            node.type = node.expr.type
+            node.impl = UNARY_OPERATORS[node.op.type]
+            return
+
+        left, right = node.left, node.right
+        op = node.op.type
+        operands = "REAL" if "REAL" in (left.type, right.type) else "INTEGER"
+        if(op == Tokens.DIV and operands == "REAL"):
+            raise TypeError("{line}:{column}: DIV of a REAL, expected INTEGER operands".format(
+                line=node.op.line, column=node.op.column))
+
+        node.type = "REAL" if op == Tokens.FLOATDIV else operands
+        node.impl = BINARY_OPERATORS[op]
+
+
+    def assign(self, node):
+        """ check an Assign whose target and value are annotated """
+        target, value = node.left.type, node.right.type
+        if(target == "INTEGER" and value == "REAL"):
+            raise TypeError("{line}:{column}: REAL assigned to INTEGER variable {name}".format(
+                line=node.op.line, column=node.op.column, name=repr(node.left.value)))
+        if(target == "REAL" and value == "INTEGER"):
+            node.coerce = float
+        elif(target == "REAL" and isinstance(node.right, Ternary)):
+            # a REAL ternary may still select its INTEGER expression
+            if "INTEGER" in (node.right.true_expr.type, node.right.false_expr.type):
+                node.coerce = float
 
 
     def visit_Program(self, node):
+        self.current_scope = None
+        self.enter_scope("global")
         self.visit(node.block)
+        self.leave_scope()
 
 
     def visit_Block(self, node):
+        node.scope = self.current_scope
         for declaration in node.declarations:
             self.visit(declaration)
 
@@ -106,11 +465,7 @@ class SemanticAnalyzer(NodeVisitor):
 
 
     def visit_VarDecl(self, node):
-        type_name = node.type_node.value
-        type_symbol = self.symtab.lookup(type_name)
-        var_name = node.var_node.value
-        var_symbol = VarSymbol(var_name, type_symbol)
-        self.symtab.define(var_symbol)
+        self.declare(node)
 
 
     def visit_Type(self, node):
@@ -127,33 +482,33 @@ class SemanticAnalyzer(NodeVisitor):
 
 
     def visit_Var(self, node):
-        var_name = node.value
-        # val = self.GLOBAL_SCOPE.get(var_name)
-        var_symbol = self.symtab.lookup(var_name)
-        if not var_symbol:
-            raise NameError(repr(var_name))
+        self.resolve(node)
 
 
 
     def visit_Assign(self, node):
-        var_name = node.left.value
-        # self.GLOBAL_SCOPE[var_name] = self.visit(node.right)
         # check if we've declared this var
-        var_symbol = self.symtab.lookup(var_name)
-        if not var_symbol:
-            raise NameError(repr(var_name))
-
+        self.visit(node.left)
         self.visit(node.right)
+        self.assign(node)
 
 
 
     def visit_BinOp(self, node):
-        self.visit(node.left)
-        self.visit(node.right)
+        for node in postorder(node):
+            if(NODE_KINDS[node.__class__] in (BinOp, UnaryOp)):
+                self.infer(node)
+            else:
+                self.visit(node)
+
+    visit_UnaryOp = visit_BinOp
 
 
-    def visit_UnaryOp(self, node):
-        self.visit(node.expr)
+    def visit_Ternary(self, node):
+        self.visit(node.condition)
+        self.visit(node.true_expr)
+        self.visit(node.false_expr)
+        self.infer(node)
 
 
     def visit_Num(self, node):
@@ -162,19 +517,47 @@ class SemanticAnalyzer(NodeVisitor):
 
 
     def visit_ProcedureDecl(self, node):
-        pass
+        self.declare_procedure(node.proc_name)
+        self.visit(node.block_node)
+        self.leave_scope()
+
+
 
 
+# value of a frame slot that has not been assigned yet
+UNSET = object()
 
 
 
 class Interpreter(NodeVisitor):
+    """ Walks an analyzed tree (see SemanticAnalyzer)
+
+        variables live in frames, lists indexed by slot. display[level] is the
+        frame of the innermost active scope of that level.
+    """
     def __init__(self, tree):
         self.tree = tree
-        self.GLOBAL_SCOPE = dict()
+        self.display = [None]
+        self.global_scope = None
+
+
+    @property
+    def GLOBAL_SCOPE(self):
+        """ the program's variables by name """
+        if self.global_scope is None:
+            return dict()
+
+        frame = self.display[self.global_scope.scope_level]
+        return {
+            name: frame[symbol.slot]
+            for name, symbol in self.global_scope._symbols.items()
+            if isinstance(symbol, VarSymbol) and frame[symbol.slot] is not UNSET
+        }
 
 
     def visit_Program(self, node):
+        self.global_scope = node.block.scope
+        self.display = [None]
         self.visit(node.block)
 
 
@@ -182,6 +565,7 @@ class Interpreter(NodeVisitor):
         for declaration in node.declarations:
             self.visit(declaration)
 
+        self.display.append([UNSET] * node.scope.slots)
         self.visit(node.compound_statement)
 
 
@@ -207,81 +591,349 @@ class Interpreter(NodeVisitor):
 
 
     def visit_Var(self, node):
-        var_name = node.value
-        val = self.GLOBAL_SCOPE.get(var_name)
-        if val:
-            return val
+        value = self.display[node.level][node.slot]
+        if value is UNSET:
+            raise NameError(repr(node.value))
 
-        raise NameError(repr(var_name))
+        return value
 
 
     def visit_Assign(self, node):
-        var_name = node.left.value
-        self.GLOBAL_SCOPE[var_name] = self.visit(node.right)
+        var = node.left
+        value = self.evaluate(node.right)
+        if node.coerce is not None:
+            value = node.coerce(value)
+        self.display[var.level][var.slot] = value
+
+
+    def evaluate(self, node):
+        """ the value of an expression
+
+            BinOp and UnaryOp are evaluated with an explicit stack instead of
+            recursion, so deep expressions don't hit the recursion limit:
+            down the left operands to a leaf, then back up applying the
+            operators, going down each right operand that isn't a leaf.
+            other nodes are visited.
+        """
+        display = self.display
+        stack = [] # UnaryOp or BinOp waiting for its operand, or (BinOp, left value)
+        push, pop = stack.append, stack.pop
+        while True:
+            while True:
+                cls = node.__class__
+                if(cls is BinOp or cls is UnaryOp):
+                    push(node)
+                    node = node.left if cls is BinOp else node.expr
+                    continue
+                if(cls is Var):
+                    value = display[node.level][node.slot]
+                    if value is UNSET:
+                        raise NameError(repr(node.value))
+                elif(cls is Num):
+                    value = node.token.value
+                elif(NODE_KINDS[cls] is cls):
+                    value = self.visit(node)
+                else:
+                    value = self._evaluate_view(node)
+                break
+
+            while stack:
+                node = pop()
+                cls = node.__class__
+                if(cls is BinOp):
+                    right = node.right
+                    cls = right.__class__
+                    if(cls is Num):
+                        right = right.token.value
+                    elif(cls is Var):
+                        right = display[right.level][right.slot]
+                        if right is UNSET:
+                            raise NameError(repr(node.right.value))
+                    else:
+                        push((node, value))
+                        node = right
+                        break
+                    left = value
+                elif(cls is UnaryOp):
+                    impl = node.impl
+                    if impl is None:
+                        impl = UNARY_OPERATORS[node.op.type]
+                    value = impl(value)
+                    continue
+                else:
+                    node, left = node
+                    right = value
+
+                impl = node.impl
+                if impl is None: # not analyzed, e.g. a bare expression
+                    impl = BINARY_OPERATORS[node.op.type]
+                value = impl(left, right)
+            else:
+                return value
+
+
+    def _evaluate_view(self, node):
+        """ evaluate() for a node of an AST subclass (an ASTArena view), recursive """
+        kind = NODE_KINDS[node.__class__]
+        if(kind is BinOp):
+            impl = node.impl or BINARY_OPERATORS[node.op.type]
+            return impl(self.evaluate(node.left), self.evaluate(node.right))
+        if(kind is UnaryOp):
+            impl = node.impl or UNARY_OPERATORS[node.op.type]
+            return impl(self.evaluate(node.expr))
+        if(kind is Var):
+            value = self.display[node.level][node.slot]
+            if value is UNSET:
+                raise NameError(repr(node.value))
+            return value
+        if(kind is Num):
+            return node.token.value
+        return self.visit(node)
 
 
     def visit_BinOp(self, node):
-        if(node.op.type == Tokens.PLUS):
-            return self.visit(node.left) + self.visit(node.right)
-        elif(node.op.type == Tokens.MINUS):
-            return self.visit(node.left) - self.visit(node.right)
-        elif(node.op.type == Tokens.MUL):
-            return self.visit(node.left) * self.visit(node.right)
-        elif(node.op.type == Tokens.FLOATDIV):
-            return self.visit(node.left) / self.visit(node.right) # float DIV
-        elif(node.op.type == Tokens.DIV.type):
-            return self.visit(node.left) // self.visit(node.right)
-
-    def visit_UnaryOp(self, node):
-        op = node.op.type
-        if op == Tokens.PLUS:
-            return +self.visit(node.expr)
-        elif op == Tokens.MINUS:
-            return -self.visit(node.expr)
+        return self.evaluate(node)
+
+    visit_UnaryOp = visit_BinOp
+
+
+    def visit_Ternary(self, node):
+        if self.evaluate(node.condition):
+            return self.evaluate(node.true_expr)
+        return self.evaluate(node.false_expr)
 
 
     def visit_Num(self, node):
         return node.value
 
 
+    def analyze(self):
+        """ run SemanticAnalyzer over the tree unless it was analyzed already """
+        tree = self.tree
+        if(isinstance(tree, Program) and tree.block.scope is None):
+            SemanticAnalyzer().visit(tree)
+
+
     def interpret(self):
         tree = self.tree
         if tree:
+            self.analyze()
             return self.visit(tree)
 
 
+    def interpret_stream(self, program, statements):
+        """ run the statements of the main block one by one as they come
 
-if(__name__ == "__main__"):
-    if(len(sys.argv) == 2):
-        print(sys.argv[1])
-        with open(sys.argv[1], "r") as f:
-            file_stream = f.read()
-            lex = Lexer(file_stream)
-            parser = Parser(lex)
-            tree = parser.parse()
-            symtab_builder = SemanticAnalyzer()
-            symtab_builder.visit(tree)
-            print("Symbol Table contents:")
-            print(symtab_builder.symtab)
+            program and statements as Parser.parse_stream() or stream_program()
+            give them; no more than the statement that ran last and the one
+            being parsed are held at a time.
+        """
+        self.tree = program
+        self.visit(program) # the frames, with the compound statement still empty
+        visit = self.visit
+        for statement in statements:
+            visit(statement)
 
 
+    def compile(self):
+        """ compile the tree to closures once, see compiler.CompiledProgram.run """
+        from compiler import ClosureCompiler # compiler imports NodeVisitor from here
+        self.analyze()
+        return ClosureCompiler(self.tree).compile()
 
-            interpreter = Interpreter(tree)
-            result = interpreter.interpret()
-            print("MEMORY contents:")
-            print(interpreter.GLOBAL_SCOPE)
 
 
-    else:
-        while True:
-            text = input("cal> ")
-            if(text == "exit"):
-                break
-            else:
-                lex = Lexer(text) # make tokens 
-                parser = Parser(lex) # make AST from tokens
-                interpreter = Interpreter(parser) # interpret AST
-                result = interpreter.interpret()
-                print(result)
+def _timing():
+    return dict(count=0, total_ns=0, self_ns=0)
+
+
 
+class ProfilingInterpreter(Interpreter):
+    """ Interpreter that times every visit, see report() and collapsed()
+
+        counts, total and self times (perf_counter_ns, self without the
+        nested visits) are kept per node class in kinds, per Assign by source
+        line in lines, for the program in procedures and self times per
+        stack of visits in stacks. a ProcedureDecl is only its declaration,
+        never run, so it is not in procedures; calls would be. total counts a nested visit
+        of the same class twice, as profilers do for recursion.
+        the operators of an expression are timed one by one too, in a loop
+        with an explicit stack like postorder(), so an expression too deep
+        for recursion is profiled as the Interpreter runs it. Interpreter
+        itself is untouched: no cost when not profiling.
+    """
+    def __init__(self, tree):
+        super().__init__(tree)
+        self.kinds = defaultdict(_timing)
+        self.lines = defaultdict(_timing)
+        self.procedures = defaultdict(_timing)
+        self.stacks = defaultdict(int)
+        self._stack = [""] # collapsed stack of the visits in progress
+        self._nested = [0] # time in nested visits, per visit in progress
+
+
+    def visit(self, node):
+        entered = self.enter(node)
+        try:
+            return super().visit(node)
+        finally:
+            self.leave(node, entered)
+
+
+    def enter(self, node):
+        """ start timing node, returns what leave() needs """
+        kind = node.__class__.__name__
+        if(kind == "Assign"):
+            frame = "Assign:{}".format(node.op.line)
+        elif(kind == "Program"):
+            frame = "Program:" + node.name
+        elif(kind == "ProcedureDecl"):
+            frame = "ProcedureDecl:" + node.proc_name
+        else:
+            frame = kind
+
+        stack = self._stack
+        key = stack[-1] + ";" + frame if len(stack) > 1 else frame
+        stack.append(key)
+        self._nested.append(0)
+        return kind, frame, key, perf_counter_ns()
+
+
+    def leave(self, node, entered):
+        """ stop timing node, the last one entered """
+        kind, frame, key, start = entered
+        total = perf_counter_ns() - start
+        nested = self._nested
+        self._stack.pop()
+        own = total - nested.pop()
+        nested[-1] += total
+
+        timings = [self.kinds[kind]]
+        if(kind == "Assign"):
+            timings.append(self.lines[node.op.line])
+        elif(kind == "Program"):
+            timings.append(self.procedures[node.name])
+        for timing in timings:
+            timing["count"] += 1
+            timing["total_ns"] += total
+            timing["self_ns"] += own
+        self.stacks[key] += own
+
+
+    def evaluate(self, node):
+        return self.visit(node)
 
+
+    def visit_BinOp(self, node):
+        # node is timed by visit(), the operators under it are entered when
+        # they are taken off the stack and left when their value is made
+        root = node
+        values = []
+        todo = [(node, None)] # (node, None) to descend into, (node, entered) when its operands are done
+        try:
+            while todo:
+                node, entered = todo.pop()
+                cls = NODE_KINDS[node.__class__]
+                if entered is not None:
+                    try:
+                        if(cls is BinOp):
+                            right = values.pop()
+                            values[-1] = (node.impl or BINARY_OPERATORS[node.op.type])(values[-1], right)
+                        else:
+                            values[-1] = (node.impl or UNARY_OPERATORS[node.op.type])(values[-1])
+                    finally:
+                        if entered:
+                            self.leave(node, entered)
+                elif(cls is BinOp or cls is UnaryOp):
+                    todo.append((node, self.enter(node) if node is not root else ()))
+                    if(cls is BinOp):
+                        todo.append((node.right, None))
+                        todo.append((node.left, None))
+                    else:
+                        todo.append((node.expr, None))
+                else:
+                    values.append(self.visit(node))
+        except BaseException:
+            for node, entered in reversed(todo):
+                if entered:
+                    self.leave(node, entered)
+            raise
+        return values[0]
+
+    visit_UnaryOp = visit_BinOp
+
+
+    def report(self, limit=15):
+        """ the hot spots: node classes by self time, Assign lines and
+            procedures by total time, with their share of the run
+        """
+        elapsed = sum(timing["self_ns"] for timing in self.kinds.values()) or 1
+        lines = []
+        for title, timings, by in (
+            ("node", self.kinds, "self_ns"),
+            ("line", self.lines, "total_ns"),
+            ("procedure", self.procedures, "total_ns"),
+        ):
+            lines.append("{:<24} {:>10} {:>12} {:>12} {:>7}".format(
+                title, "count", "total ms", "self ms", "%"))
+            ranked = sorted(timings.items(), key=lambda item: item[1][by], reverse=True)
+            for name, timing in ranked[:limit]:
+                lines.append("{:<24} {:>10} {:>12.3f} {:>12.3f} {:>6.1f}%".format(
+                    str(name), timing["count"], timing["total_ns"] / 1e6,
+                    timing["self_ns"] / 1e6, 100 * timing[by] / elapsed))
+            lines.append("")
+        return "\n".join(lines)
+
+
+    def collapsed(self):
+        """ the stacks in the collapsed format of flamegraph.pl, self ns per stack """
+        return "".join(
+            "{} {}\n".format(stack, ns) for stack, ns in sorted(self.stacks.items())
+        )
+
+
+
+def load_program(path, cache=None):
+    """ lex, parse, analyze and fold the program in path
+
+        with an ASTCache, a tree stored for the same source is loaded instead
+        and a new one is stored.
+    """
+    from optimizer import ConstantFolder # optimizer imports NodeVisitor from here
+
+    if cache is not None:
+        from cache import source_key
+        key = source_key(path)
+        tree = cache.load(key)
+        if tree is not None:
+            return tree
+
+    parser = Parser(Lexer.from_path(path), SemanticAnalyzer()) # analyzes while parsing
+    tree = ConstantFolder(parser.parse()).fold()
+    if cache is not None:
+        cache.store(key, tree)
+    return tree
+
+
+
+def stream_program(path):
+    """ (program, statements) for Interpreter.interpret_stream()
+
+        like load_program() but the main block's statements are lexed,
+        parsed, analyzed and folded one at a time as they are taken, see
+        Parser.parse_stream(). nothing is cached, there is no whole tree.
+    """
+    from optimizer import ConstantFolder
+
+    parser = Parser(Lexer.from_path(path), SemanticAnalyzer())
+    program, statements = parser.parse_stream()
+    program = ConstantFolder(program).fold()
+    return program, (ConstantFolder(statement).fold() for statement in statements)
+
+
+
+
+if(__name__ == "__main__"):
+    # the command line is run.py's; the trees it caches then name interpreter.<class>, not __main__.<class>
+    from run import main
+    main()
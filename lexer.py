@@ -1,19 +1,102 @@
+import codecs
+import mmap
+import re
+from inspect import getgeneratorstate, GEN_CREATED
+
 from tokens import Token
 from tokens import Tokens
+from tokens import RESERVED_KEYWORDS
+from tokenbuffer import TokenBuffer
+
+
+# master pattern for the regex scanner engine. whitespace and {...} comments
+# are skipped by the leading group, so every token costs one match() call.
+# no token group matches at the end of input (or on an invalid charactor).
+TOKEN_PATTERN = re.compile(r"""
+    (?: \s+ | \{[^}]*\} )*
+    (?:
+          (?P<ID>     [^\W\d_][^\W_]* )
+        | (?P<REAL>   \d+\.\d* )
+        | (?P<INT>    \d+ )
+        | (?P<ASSIGN> := )
+        | (?P<PUNCT>  [?,+\-*/():;.] )
+    )?
+""", re.VERBOSE)
+
+
+PUNCTUATION = {
+    "?": Tokens.TERNARY,
+    ",": Tokens.COMMA,
+    "+": Tokens.PLUS,
+    "-": Tokens.MINUS,
+    "*": Tokens.MUL,
+    "/": Tokens.FLOATDIV,
+    "(": Tokens.LPAREN,
+    ")": Tokens.RPAREN,
+    ":": Tokens.COLON,
+    ";": Tokens.SEMI,
+    ".": Tokens.DOT,
+}
 
 
 
 class Lexer:
-    def __init__(self, text):
+    def __init__(self, text, regex=False, chunks=None, symbols=None):
+        """ regex=True selects the single-pass regex scanner engine
+            chunks: iterator of more text to scan after `text` (regex engine only)
+            symbols: identifier pool shared by the lexers of one compilation
+        """
         self.text = text
+        self.symbols = {} if symbols is None else symbols
         self.pos = 0
-        self.curr_char = self.text[self.pos] # inital start
+        self.line = 1
+        self.column = 1
+        self.line_start = 0 # offset of the current line, for the regex engine
+        self.curr_char = self.text[self.pos] if self.text else None # inital start
+        self.regex = regex or chunks is not None
+        self._chunks = chunks
+        self._base = 0 # offset of self.text in the whole input
+        regex = self.regex
+        if regex:
+            # the scanner generator replaces the char-by-char get_next_token
+            self._tokens = self._scan()
+            self.get_next_token = self._tokens.__next__
+
+
+    @classmethod
+    def from_path(cls, path, chunk_size=1 << 20, encoding="utf-8"):
+        """ scan a file through mmap without reading it into one str """
+        return cls("", chunks=_mmap_chunks(path, chunk_size, encoding))
+
+
+    @classmethod
+    def from_stream(cls, stream, chunk_size=1 << 20, encoding="utf-8"):
+        """ scan a text or binary file object chunk by chunk """
+        return cls("", chunks=_stream_chunks(stream, chunk_size, encoding))
+
+
+    def seek(self, offset, line, column):
+        """ scan on from offset, a token start on line:column
+
+            with the regex engine, before the first token is read.
+        """
+        self.pos = offset
+        self.line = line
+        self.column = column
+        self.line_start = offset - column + 1
+        self.curr_char = self.text[offset] if offset < len(self.text) else None
 
 
     def __iter__(self):
         return self
 
     def __next__(self):
+        if self.regex:
+            token = self.get_next_token()
+            if(token.type == Tokens.EOF):
+                raise StopIteration
+            return token
+
         if(self.curr_char is not None):
             return self.get_next_token()
         else:
@@ -22,6 +105,12 @@ class Lexer:
 
     def advance(self):
         """ get the next char in input string """
+        if(self.curr_char == "\n"):
+            self.line += 1
+            self.column = 1
+        else:
+            self.column += 1
+
         self.pos += 1
         if(self.pos > len(self.text) -1):
             # end of input
@@ -52,6 +141,7 @@ class Lexer:
 
     def number(self):
         """ return (multidigit) int or float """
+        offset, line, column = self.pos, self.line, self.column
         number = ""
         while(self.curr_char is not None and self.curr_char.isdigit()):
             number += self.curr_char
@@ -65,25 +155,162 @@ class Lexer:
                 number += self.curr_char
                 self.advance()
 
-            token = Token(Tokens.REAL_CONST, float(number))
+            token = Token(Tokens.REAL_CONST, float(number), offset, line, column)
         else:
-            token = Token(Tokens.INT_CONST, int(number))
+            token = Token(Tokens.INT_CONST, int(number), offset, line, column)
 
         return token
 
 
     def _id(self):
         """ handel identifiers and reserved keywords """
+        offset, line, column = self.pos, self.line, self.column
         result = ""
         while(self.curr_char is not None and self.curr_char.isalnum()):
             result += self.curr_char
             self.advance()
 
-        # RESERVED_KEYWORDS
-        if(hasattr(Tokens, result)):
-            return getattr(Tokens, result)
+        return self._reserved(result, offset, line, column)
+
+
+    def _reserved(self, name, offset=0, line=0, column=0):
+        """ map an identifier to its reserved keyword token or to an ID token
+
+            identifier names are interned in self.symbols, so every occurrence
+            of a name shares one str and symbol table lookups hit on identity.
+        """
+        symbol = self.symbols.get(name)
+        if(symbol is None):
+            keyword = RESERVED_KEYWORDS.get(name.upper())
+            if(keyword is not None):
+                return Token(keyword[0], keyword[1], offset, line, column)
+            symbol = self.symbols[name] = name
+
+        return Token(Tokens.ID, symbol, offset, line, column)
+
+
+    def _matches(self):
+        """ yield (match, offset, line, column) for master pattern matches that hold a token
+
+            with a chunk source, self.text is a window over the input. a match
+            that touches the end of the window (a token, comment or ":" that may
+            continue) is retried after the next chunk is appended.
+        """
+        text = self.text
+        end = len(text)
+        match = TOKEN_PATTERN.match
+        pos = self.pos
+        base = self._base
+        line = self.line
+        line_start = self.line_start
+        chunks = self._chunks
+
+        while True:
+            m = match(text, pos)
+            kind = m.lastgroup
+            if(chunks is not None and (kind is None or m.end() == end)):
+                chunk = next(chunks, None)
+                if chunk is None: # end of input
+                    chunks = self._chunks = None
+                else:
+                    base = self._base = base + pos
+                    text = self.text = text[pos:] + chunk
+                    end = len(text)
+                    pos = 0
+                continue
 
-        return Token(Tokens.ID, result)
+            if(kind is None):
+                break
+
+            start = m.start(kind)
+            if(start != pos):
+                newlines = text.count("\n", pos, start)
+                if newlines:
+                    line += newlines
+                    line_start = base + text.rfind("\n", pos, start) + 1
+
+            offset = base + start
+            pos = m.end()
+            yield m, offset, line, offset - line_start + 1
+
+        start = m.end()
+        newlines = text.count("\n", pos, start)
+        if newlines:
+            line += newlines
+            line_start = base + text.rfind("\n", pos, start) + 1
+
+        self.pos = pos = start
+        self.line = line
+        self.line_start = line_start
+        self.column = base + pos - line_start + 1
+        if(pos < end):
+            self.curr_char = text[pos]
+            self.error()
+
+        self.curr_char = None
+
+
+    def _scan(self):
+        """ regex scanner engine: yield tokens from one master pattern over the buffer """
+        for m, offset, line, column in self._matches():
+            kind = m.lastgroup
+            if(kind == "ID"):
+                yield self._reserved(m.group(kind), offset, line, column)
+            elif(kind == "PUNCT"):
+                value = m.group(kind)
+                yield Token(PUNCTUATION[value], value, offset, line, column)
+            elif(kind == "INT"):
+                yield Token(Tokens.INT_CONST, int(m.group(kind)), offset, line, column)
+            elif(kind == "REAL"):
+                yield Token(Tokens.REAL_CONST, float(m.group(kind)), offset, line, column)
+            else:
+                yield Token(Tokens.ASSIGN, ":=", offset, line, column)
+
+        while True:
+            yield Token(Tokens.EOF, None, self._base + self.pos, self.line, self.column)
+
+
+    def tokenize_all(self):
+        """ scan the input at once into a columnar TokenBuffer
+
+            always with the regex engine's TOKEN_PATTERN, whatever engine the
+            lexer was made with. it goes on from the tokens the character
+            engine has read, but with the regex engine call it before any
+            get_next_token(): that engine keeps its position in the scanner
+            generator, self.pos is not moved, so it is a RuntimeError.
+        """
+        if self.regex:
+            if(getgeneratorstate(self._tokens) != GEN_CREATED):
+                raise RuntimeError("tokenize_all() after get_next_token() of the regex engine")
+        else:
+            self.line_start = self.pos - self.column + 1 # not kept by the character engine
+
+        buffer = TokenBuffer()
+        append = buffer.append
+        symbols = self.symbols
+
+        for m, offset, line, column in self._matches():
+            kind = m.lastgroup
+            value = m.group(kind)
+            end = offset + len(value)
+            if(kind == "ID"):
+                if(value in symbols):
+                    append(Tokens.ID, symbols[value], offset, end, line, column)
+                else:
+                    token = self._reserved(value)
+                    append(token.type, token.value, offset, end, line, column)
+            elif(kind == "PUNCT"):
+                append(PUNCTUATION[value], value, offset, end, line, column)
+            elif(kind == "INT"):
+                append(Tokens.INT_CONST, int(value), offset, end, line, column)
+            elif(kind == "REAL"):
+                append(Tokens.REAL_CONST, float(value), offset, end, line, column)
+            else:
+                append(Tokens.ASSIGN, value, offset, end, line, column)
+
+        end = self._base + self.pos
+        append(Tokens.EOF, None, end, end, self.line, self.column)
+        return buffer
 
 
 
@@ -93,7 +320,6 @@ class Lexer:
 
     def get_next_token(self):
         """ tokenizer sentence """
-
         while(self.curr_char is not None):
 
             if self.curr_char.isspace():
@@ -105,9 +331,11 @@ class Lexer:
                 self.skip_comment()
                 continue
 
+            offset, line, column = self.pos, self.line, self.column
+
             if self.curr_char == "?":
                 self.advance()
-                return Token(Tokens.TERNARY, "?")
+                return Token(Tokens.TERNARY, "?", offset, line, column)
 
             if self.curr_char.isdigit():
                 return self.number()
@@ -115,31 +343,31 @@ class Lexer:
 
             if self.curr_char == ",":
                 self.advance()
-                return Token(Tokens.COMMA, ",")
+                return Token(Tokens.COMMA, ",", offset, line, column)
 
             if self.curr_char == "+":
                 self.advance()
-                return Token(Tokens.PLUS, "+")
+                return Token(Tokens.PLUS, "+", offset, line, column)
 
             if self.curr_char == "-":
                 self.advance()
-                return Token(Tokens.MINUS, "-")
+                return Token(Tokens.MINUS, "-", offset, line, column)
 
             if self.curr_char == "*":
                 self.advance()
-                return Token(Tokens.MUL, "*")
+                return Token(Tokens.MUL, "*", offset, line, column)
 
             if self.curr_char == "/":
                 self.advance()
-                return Token(Tokens.FLOATDIV, "/")
+                return Token(Tokens.FLOATDIV, "/", offset, line, column)
 
             if self.curr_char == "(":
                 self.advance()
-                return Token(Tokens.LPAREN, "(")
+                return Token(Tokens.LPAREN, "(", offset, line, column)
 
             if self.curr_char == ")":
                 self.advance()
-                return Token(Tokens.RPAREN, ")")
+                return Token(Tokens.RPAREN, ")", offset, line, column)
 
             if self.curr_char.isalpha():
                 return self._id()
@@ -148,25 +376,68 @@ class Lexer:
             if self.curr_char == ":" and self.peek() == "=":
                 self.advance()
                 self.advance()
-                return Token(Tokens.ASSIGN, ":=")
+                return Token(Tokens.ASSIGN, ":=", offset, line, column)
 
             if self.curr_char == ":":
                 self.advance()
-                return Token(Tokens.COLON, ":")
+                return Token(Tokens.COLON, ":", offset, line, column)
 
 
             if self.curr_char == ";":
                 self.advance()
-                return Token(Tokens.SEMI, ";")
+                return Token(Tokens.SEMI, ";", offset, line, column)
 
             if self.curr_char == ".":
                 self.advance()
-                return Token(Tokens.DOT, ".")
+                return Token(Tokens.DOT, ".", offset, line, column)
 
 
             self.error()
 
-        return Token(Tokens.EOF, None)
+        return Token(Tokens.EOF, None, self.pos, self.line, self.column)
+
+
+
+
+def _mmap_chunks(path, chunk_size, encoding):
+    """ decoded chunks of a memory-mapped file, never empty
+
+        a chunk that ends inside a multi-byte character decodes to less, or
+        to nothing: the decoder keeps the bytes for the next chunk.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    with open(path, "rb") as f:
+        if(f.seek(0, 2) == 0):
+            return # mmap can't map an empty file
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for start in range(0, len(data), chunk_size):
+                chunk = decoder.decode(data[start:start + chunk_size])
+                if chunk:
+                    yield chunk
+
+    chunk = decoder.decode(b"", final=True)
+    if chunk:
+        yield chunk
+
+
+def _stream_chunks(stream, chunk_size, encoding):
+    """ decoded chunks of a text or binary stream, never empty, see _mmap_chunks """
+    decoder = None
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        if isinstance(chunk, bytes):
+            decoder = decoder or codecs.getincrementaldecoder(encoding)()
+            chunk = decoder.decode(chunk)
+        if chunk:
+            yield chunk
+
+    if decoder is not None:
+        chunk = decoder.decode(b"", final=True)
+        if chunk:
+            yield chunk
 
 
 
@@ -175,4 +446,6 @@ class Lexer:
 # l = Lexer("2 * 3 + 3")
 # for token in l:
 # or call l.get_next_token()
+# Lexer("2 * 3 + 3", regex=True) produces the same tokens with the regex engine
+# Lexer.from_path("testfile.txt") scans a file without loading it whole
 
@@ -0,0 +1,149 @@
+from tokens import Token
+from tokens import Tokens
+from parser import Num, UnaryOp, BinOp
+# the operations the Interpreter performs, so folded values are identical
+from interpreter import NodeVisitor, BINARY_OPERATORS, NODE_KINDS, postorder
+
+
+
+def num(value, token):
+    """ a Num for a folded value, positioned at `token` """
+    token_type = Tokens.REAL_CONST if isinstance(value, float) else Tokens.INT_CONST
+    return Num(Token(token_type, value, token.offset, token.line, token.column))
+
+
+def is_int(node, value):
+    """ is node the INTEGER constant `value` (1.0 is REAL and changes the type) """
+    return type(node) is Num and node.token.type == Tokens.INT_CONST and node.value == value
+
+
+
+class ConstantFolder(NodeVisitor):
+    """ Optimization pass between Parser.parse() and the execution engines
+
+        folds constant BinOp/UnaryOp subtrees, replaces a Ternary with a
+        constant condition by the expression it selects and removes identities:
+        x*1, 1*x, x+0, 0+x, x-0, +x and --x become x. only INTEGER constants
+        count as identities, x*1.0 makes x REAL. a division by a constant zero
+        is left for the run time to raise.
+        every visit returns the node that replaces the one visited.
+    """
+    def __init__(self, tree):
+        self.tree = tree
+
+
+    def fold(self):
+        return self.visit(self.tree)
+
+
+    def visit_Program(self, node):
+        node.block = self.visit(node.block)
+        return node
+
+
+    def visit_Block(self, node):
+        node.declarations = [self.visit(declaration) for declaration in node.declarations]
+        node.compound_statement = self.visit(node.compound_statement)
+        return node
+
+
+    def visit_ProcedureDecl(self, node):
+        node.block_node = self.visit(node.block_node)
+        return node
+
+
+    def visit_VarDecl(self, node):
+        return node
+
+
+    def visit_Compound(self, node):
+        node.children = [self.visit(child) for child in node.children]
+        return node
+
+
+    def visit_Assign(self, node):
+        node.right = self.visit(node.right)
+        return node
+
+
+    def visit_NoOp(self, node):
+        return node
+
+
+    def visit_Var(self, node):
+        return node
+
+
+    def visit_Num(self, node):
+        return node
+
+
+    def visit_BinOp(self, node):
+        # folded operands wait on a stack, see interpreter.postorder()
+        folded = []
+        for node in postorder(node):
+            cls = NODE_KINDS[node.__class__]
+            if(cls is BinOp):
+                right = folded.pop()
+                folded[-1] = self.fold_binary(node, folded[-1], right)
+            elif(cls is UnaryOp):
+                folded[-1] = self.fold_unary(node, folded[-1])
+            else:
+                folded.append(self.visit(node))
+        return folded[0]
+
+    visit_UnaryOp = visit_BinOp
+
+
+    def visit_Ternary(self, node):
+        # a constant condition selects the expression now, the other one is dropped
+        condition = self.visit(node.condition)
+        if(type(condition) is Num):
+            return self.visit(node.true_expr if condition.value else node.false_expr)
+
+        node.condition = condition
+        node.true_expr = self.visit(node.true_expr)
+        node.false_expr = self.visit(node.false_expr)
+        return node
+
+
+    def fold_unary(self, node, expr):
+        """ the node for UnaryOp node with its operand folded to expr """
+        minus = node.op.type == Tokens.MINUS
+
+        if(type(expr) is Num):
+            return num(-expr.value if minus else +expr.value, node.op)
+        if not minus:
+            return expr # +x
+        if(type(expr) is UnaryOp and expr.op.type == Tokens.MINUS):
+            return expr.expr # --x
+
+        node.expr = expr
+        return node
+
+
+    def fold_binary(self, node, left, right):
+        """ the node for BinOp node with its operands folded to left and right """
+        op = node.op.type
+
+        if(type(left) is Num and type(right) is Num):
+            if not (op in (Tokens.FLOATDIV, Tokens.DIV) and right.value == 0):
+                return num(BINARY_OPERATORS[op](left.value, right.value), node.op)
+
+        if(op == Tokens.PLUS):
+            if is_int(right, 0):
+                return left
+            if is_int(left, 0):
+                return right
+        elif(op == Tokens.MINUS):
+            if is_int(right, 0):
+                return left
+        elif(op == Tokens.MUL):
+            if is_int(right, 1):
+                return left
+            if is_int(left, 1):
+                return right
+
+        node.left = left
+        node.right = right
+        return node
@@ -0,0 +1,190 @@
+import re
+from concurrent.futures import Future
+
+from tokens import Tokens
+from lexer import Lexer
+from tokenbuffer import TokenBuffer
+from parser import Parser, ProcedureDecl
+from interpreter import SemanticAnalyzer, VarSymbol, ProcedureSymbol
+from optimizer import ConstantFolder
+from bytecode import BytecodeCompiler, Code
+
+
+# the token types procedure_spans() has to look at, as a bytes character class
+_BLOCK_TOKENS = re.compile(b"[" + re.escape(bytes([Tokens.PROCEDURE, Tokens.BEGIN, Tokens.END])) + b"]")
+
+
+
+def procedure_spans(types):
+    """ token index ranges [start, end) of the program's procedure declarations
+
+        a pre-scan over the token types (a TokenBuffer's types column) that
+        only matches PROCEDURE, BEGIN and END: a declaration ends at the END
+        that closes its own compound statement, after those of the
+        procedures nested in it, and the SEMI after that. nested procedures
+        are part of their top-level one. a malformed program gives spans the
+        parser then rejects.
+    """
+    spans = []
+    pending = depth = 0 # blocks still open, BEGIN nesting
+    start = None
+    data = types.tobytes()
+    for m in _BLOCK_TOKENS.finditer(data):
+        index = m.start()
+        token_type = data[index]
+        if(token_type == Tokens.PROCEDURE):
+            if(pending == 0):
+                start = index
+            pending += 1
+        elif(token_type == Tokens.BEGIN):
+            if(pending == 0):
+                break # the program's own compound statement
+            depth += 1
+        else:
+            depth -= 1
+            if(depth == 0):
+                pending -= 1
+                if(pending == 0):
+                    spans.append((start, index + 2)) # END SEMI
+    return spans
+
+
+
+def compile_procedure(job):
+    """ parse, analyze, fold and compile one procedure declaration, in a worker
+
+        job is (tokens, globals): the declaration's tokens as
+        TokenBuffer.to_bytes() of a TokenBuffer.slice() and the program's
+        variables as (name, type name) in declaration order, so the global
+        scope and frame slots are the ones the whole program gets.
+        returns the procedure's bytecode Code, without its tree: only the
+        Code is merged, the analyzed tree and its scopes would cost more to
+        send back than the tokens did to send.
+    """
+    tokens, global_vars = job
+
+    analyzer = SemanticAnalyzer()
+    analyzer.enter_scope("global")
+    scope = analyzer.current_scope
+    for name, type_name in global_vars:
+        scope.insert(VarSymbol(name, scope.lookup(type_name)))
+
+    parser = Parser(TokenBuffer.from_bytes(tokens).cursor(), analyzer)
+    node = parser.procedure_declaration()
+    if parser.current_token.type != Tokens.EOF:
+        parser.error()
+    node = ConstantFolder(node).fold()
+
+    compiler = BytecodeCompiler(node)
+    compiler.code = Code("global", scope.scope_level) # the enclosing Code, only its level is read
+    compiler.visit(node)
+    code = compiler.code.procedures[0]
+    code.enclosing = None # set to the program's Code when merged
+    return code
+
+
+
+class _Inline:
+    """ executor that runs each job at once, for workers=0 """
+    def submit(self, function, *args):
+        future = Future()
+        try:
+            future.set_result(function(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+
+class _ProgramParser(Parser):
+    """ parses the program with its procedure declarations sent to an executor
+
+        each declaration becomes a placeholder ProcedureDecl without a block
+        and a future of its Code, merged by compile_program().
+    """
+    def __init__(self, buffer, spans, executor):
+        self.buffer = buffer
+        self.spans = dict(spans)
+        self.executor = executor
+        self.pending = [] # (placeholder, future) in declaration order
+        self.global_vars = None
+        super().__init__(buffer.cursor(), SemanticAnalyzer())
+
+
+    def procedure_declaration(self):
+        buffer = self.buffer
+        start = self.lexer.index - 1
+        end = self.spans.get(start)
+        if end is None:
+            # procedure_spans() found no end for it: parse it here, to raise
+            # the error the sequential parser would
+            return super().procedure_declaration()
+        name = buffer.token(start + 1).value
+
+        scope = self.analyzer.current_scope
+        if self.global_vars is None:
+            self.global_vars = [
+                (symbol.name, symbol.type.name) for symbol in scope._symbols.values()
+                if isinstance(symbol, VarSymbol)
+            ]
+        scope.insert(ProcedureSymbol(name))
+
+        job = (buffer.slice(start, end).to_bytes(), self.global_vars)
+        placeholder = ProcedureDecl(name, None)
+        self.pending.append((placeholder, self.executor.submit(compile_procedure, job)))
+
+        self.lexer.index = end
+        self.current_token = self.lexer.get_next_token()
+        return placeholder
+
+
+
+class _ProgramCompiler(BytecodeCompiler):
+    """ BytecodeCompiler that takes the procedures' Code from the workers """
+    def __init__(self, tree, procedures):
+        super().__init__(tree)
+        self.procedures = procedures
+
+    def visit_ProcedureDecl(self, node):
+        procedure = self.procedures.get(node)
+        if procedure is None: # parsed by _ProgramParser itself
+            return super().visit_ProcedureDecl(node)
+        procedure.enclosing = self.code
+        self.code.procedures.append(procedure)
+
+
+
+def compile_program(text, executor=None):
+    """ the bytecode Code of a program, its procedures compiled by an executor
+
+        the code is what BytecodeCompiler gives for the tree of
+        Parser(..., SemanticAnalyzer()) and ConstantFolder. the top-level
+        procedure declarations are parsed, analyzed, folded and compiled as
+        jobs submitted to executor (a concurrent.futures.Executor, e.g. a
+        ProcessPoolExecutor) while the rest of the program is parsed here;
+        they are merged in declaration order, so the result doesn't depend
+        on which job finishes first. without an executor the jobs run in
+        this process, one after the other. no tree is returned, the trees of
+        the procedures stay with the jobs.
+
+        this is slower than the sequential pipeline where it was measured,
+        a single CPU (bench/bench_parallel.py, 200 procedures): 1.2-1.3 s
+        sequential, 1.4-1.6 s in this process or with a ProcessPoolExecutor,
+        for the slicing, marshalling and merging. a speedup on several cores
+        has not been measured, so nothing here starts worker processes of
+        its own; time it with bench/bench_parallel.py before passing one.
+    """
+    buffer = Lexer(text, regex=True).tokenize_all()
+    spans = procedure_spans(buffer.types)
+    return _compile_program(buffer, spans, executor or _Inline())
+
+
+
+def _compile_program(buffer, spans, executor):
+    parser = _ProgramParser(buffer, spans, executor)
+    tree = parser.parse()
+    block = tree.block
+    block.compound_statement = ConstantFolder(block.compound_statement).fold()
+
+    procedures = {placeholder: future.result() for placeholder, future in parser.pending}
+    return _ProgramCompiler(tree, procedures).compile()
@@ -3,74 +3,153 @@ from tokens import Tokens
 
 
 class AST:
-    pass
+    __slots__ = ()
 
 
 class NoOp(AST):
-    pass
+    __slots__ = ()
 
 
 class UnaryOp(AST):
+    # type, impl: static type name and the operation selected for the type,
+    # set by SemanticAnalyzer
+    __slots__ = ("op", "expr", "type", "impl")
+
     def __init__(self, op, expr):
         self.op = op 
-        self.token = op
         self.expr = expr
+        self.type = None
+        self.impl = None
+
+    @property
+    def token(self):
+        return self.op
 
 
 
 class BinOp(AST):
-    
-        def __init__(self, left, op, right):
-            self.left = left
-            self.token = op
-            self.op = op
-            self.right = right
+    # type, impl: static type name and the operation selected for the type,
+    # set by SemanticAnalyzer
+    __slots__ = ("left", "op", "right", "type", "impl")
+
+    def __init__(self, left, op, right):
+        self.left = left
+        self.op = op
+        self.right = right
+        self.type = None
+        self.impl = None
+
+    @property
+    def token(self):
+        return self.op
+
+
+
+class Ternary(AST):
+    """ condition ? true_expr : false_expr, only the selected one is evaluated """
+    # type: static type name (REAL if either expression is), set by SemanticAnalyzer
+    __slots__ = ("condition", "op", "true_expr", "false_expr", "type")
+
+    def __init__(self, condition, op, true_expr, false_expr):
+        self.condition = condition
+        self.op = op
+        self.true_expr = true_expr
+        self.false_expr = false_expr
+        self.type = None
+
+    @property
+    def token(self):
+        return self.op
 
 
 
 class Num(AST):
+    __slots__ = ("token",)
+
     def __init__(self, token):
         self.token = token
-        self.value = token.value
+
+    @property
+    def value(self):
+        return self.token.value
+
+    @property
+    def type(self):
+        return "INTEGER" if self.token.type == Tokens.INT_CONST else "REAL"
 
 
 class Compound(AST):
     """ Represents a 'BEGIN ... END block """
+    __slots__ = ("children",)
+
     def __init__(self):
         self.children = []
 
 
 
 class Assign(AST):
+    # coerce: conversion of the value to the variable's type (INTEGER to
+    # REAL), set by SemanticAnalyzer
+    __slots__ = ("left", "op", "right", "coerce")
+
     def __init__(self, left, op, right):
         self.left = left
         self.op = op
-        self.token = op
         self.right = right
+        self.coerce = None
+
+    @property
+    def token(self):
+        return self.op
 
 
 
 class Var(AST):
+    # symbol and level, slot (where the variable lives at run time), set by
+    # SemanticAnalyzer. level and slot are copies of symbol.level and
+    # symbol.slot, kept on the node so the engines read a variable with one
+    # attribute load less
+    __slots__ = ("token", "symbol", "level", "slot")
+
     def __init__(self, token):
         self.token = token
-        self.value = token.value
+        self.symbol = None
+        self.level = None
+        self.slot = None
+
+    @property
+    def value(self):
+        return self.token.value
+
+    @property
+    def type(self):
+        """ the declared type name, once resolved """
+        return None if self.symbol is None else self.symbol.type.name
 
 
 
 class Program(AST):
+    __slots__ = ("name", "block")
+
     def __init__(self, name, block):
         self.name = name
         self.block = block
 
 
 class Block(AST):
+    # scope: the block's ScopedSymbolTable, set by SemanticAnalyzer
+    __slots__ = ("declarations", "compound_statement", "scope")
+
     def __init__(self, declarations, compound_statement):
         self.declarations = declarations
         self.compound_statement = compound_statement
+        self.scope = None
 
 
 
 class VarDecl(AST):
+    __slots__ = ("var_node", "type_node")
+
     def __init__(self, var_node, type_node):
         self.var_node = var_node
         self.type_node = type_node
@@ -78,13 +157,20 @@ class VarDecl(AST):
 
 
 class Type(AST):
+    __slots__ = ("token",)
+
     def __init__(self, token):
         self.token = token
-        self.value = token.value
+
+    @property
+    def value(self):
+        return self.token.value
 
 
 
 class ProcedureDecl(AST):
+    __slots__ = ("proc_name", "block_node")
+
     def __init__(self, proc_name, block_node):
         self.proc_name = proc_name
         self.block_node = block_node
@@ -92,10 +178,37 @@ class ProcedureDecl(AST):
 
 
 
-class Parser:
+# how tight the operators bind in Parser.expr(), by token type. an LPAREN is
+# on the operator stack too, below everything
+BINARY_PRECEDENCE = {
+    Tokens.PLUS: 1,
+    Tokens.MINUS: 1,
+    Tokens.MUL: 2,
+    Tokens.FLOATDIV: 2,
+    Tokens.DIV: 2,
+}
+
+UNARY_PRECEDENCE = 3
+
+PREFIX_PRECEDENCE = {
+    Tokens.PLUS: UNARY_PRECEDENCE,
+    Tokens.MINUS: UNARY_PRECEDENCE,
+    Tokens.LPAREN: 0,
+}
+
 
-    def __init__(self, lexer):
+
+class Parser:
+    """ Recursive descent parser, parse() returns the Program node
+
+        given a SemanticAnalyzer the analysis runs as the nodes are built:
+        scopes are entered and left around the blocks, declarations are
+        declared and every Var and operator is annotated as soon as it is
+        made, so the tree comes out like SemanticAnalyzer().visit() leaves it.
+    """
+    def __init__(self, lexer, analyzer=None):
         self.lexer = lexer
+        self.analyzer = analyzer
         self.current_token = self.lexer.get_next_token()
 
 
@@ -114,12 +227,16 @@ class Parser:
 
     def program(self):
         """ program: PROGRAM variable SEMI block DOT"""
-        self.eat(Tokens.PROGRAM.type)
+        self.eat(Tokens.PROGRAM)
         var_node = self.variable()
         prog_name = var_node.value
         self.eat(Tokens.SEMI)
 
+        if self.analyzer is not None:
+            self.analyzer.enter_scope("global")
         block_node = self.block()
+        if self.analyzer is not None:
+            self.analyzer.leave_scope()
         program_node = Program(prog_name, block_node)
         self.eat(Tokens.DOT)
 
@@ -131,6 +248,8 @@ class Parser:
         declaration_nodes = self.declarations()
         compound_statement_node = self.compound_statement()
         node = Block(declaration_nodes, compound_statement_node)
+        if self.analyzer is not None:
+            node.scope = self.analyzer.current_scope
         return node
 
 
@@ -139,8 +258,8 @@ class Parser:
                         | empty
         """
         declarations = []
-        if(self.current_token.type == Tokens.VAR.type):
-            self.eat(Tokens.VAR.type)
+        if(self.current_token.type == Tokens.VAR):
+            self.eat(Tokens.VAR)
 
             while(self.current_token.type == Tokens.ID):
                 var_decl = self.variable_declaration()
@@ -149,19 +268,28 @@ class Parser:
 
 
         # parse ProcedureDecl to make AST node
-        while(self.current_token.type == Tokens.PROCEDURE.type):
-            self.eat(Tokens.PROCEDURE.type)
-            proc_name = self.current_token.value
-            self.eat(Tokens.ID)
-            self.eat(Tokens.SEMI)
-            block_node = self.block()
-            proc_decl = ProcedureDecl(proc_name, block_node)
-            declarations.append(proc_decl)
-            self.eat(Tokens.SEMI)
+        while(self.current_token.type == Tokens.PROCEDURE):
+            declarations.append(self.procedure_declaration())
 
         return declarations
 
 
+    def procedure_declaration(self):
+        """ procedure_declaration: PROCEDURE ID SEMI block SEMI """
+        self.eat(Tokens.PROCEDURE)
+        proc_name = self.current_token.value
+        self.eat(Tokens.ID)
+        self.eat(Tokens.SEMI)
+        if self.analyzer is not None:
+            self.analyzer.declare_procedure(proc_name)
+        block_node = self.block()
+        if self.analyzer is not None:
+            self.analyzer.leave_scope()
+        proc_decl = ProcedureDecl(proc_name, block_node)
+        self.eat(Tokens.SEMI)
+        return proc_decl
+
+
 
     def variable_declaration(self):
         """ variable_declaration: ID (COMMA ID)* COLON type_spec """
@@ -181,6 +309,9 @@ class Parser:
             VarDecl(var_node, type_node)
             for var_node in var_nodes
         ]
+        if self.analyzer is not None:
+            for var_decl in var_declarations:
+                self.analyzer.declare(var_decl)
 
         return var_declarations
 
@@ -191,10 +322,10 @@ class Parser:
                     | REAL
         """
         token = self.current_token
-        if(token.type == Tokens.INTEGER.type):
-            self.eat(Tokens.INTEGER.type)
-        elif(token.type == Tokens.REAL.type):
-            self.eat(Tokens.REAL.type)
+        if(token.type == Tokens.INTEGER):
+            self.eat(Tokens.INTEGER)
+        elif(token.type == Tokens.REAL):
+            self.eat(Tokens.REAL)
 
         node = Type(token)
         return node
@@ -202,13 +333,12 @@ class Parser:
 
     def compound_statement(self):
         """ compound_statement: BEGIN statement_list END """
-        self.eat(Tokens.BEGIN.type)
+        self.eat(Tokens.BEGIN)
         nodes = self.statement_list()
-        self.eat(Tokens.END.type)
+        self.eat(Tokens.END)
 
         root = Compound()
-        for node in nodes:
-            root.children.append(node)
+        root.children.extend(nodes)
 
         return root
 
@@ -237,7 +367,7 @@ class Parser:
                         | empty
         """
 
-        if self.current_token.type == Tokens.BEGIN.type:
+        if self.current_token.type == Tokens.BEGIN:
             node = self.compound_statement()
         elif self.current_token.type == Tokens.ID:
             node = self.assignment_statement()
@@ -248,31 +378,37 @@ class Parser:
 
 
     def assignment_statement(self):
-        """ assignment_statement: variable ASSIGN expr """
+        """ assignment_statement: variable ASSIGN conditional """
         
         # print(self.current_token)
         left = self.variable() # Var(Token(ID, <name>))
+        if self.analyzer is not None:
+            self.analyzer.resolve(left)
         token = self.current_token
         self.eat(Tokens.ASSIGN)
-        right = self.expr()
-        if self.current_token.type == Tokens.TERNARY:
-            self.eat(Tokens.TERNARY)
-            # we need to check the value returned from the right expr
-            if right.value:
-                right = self.expr()
-                self.eat(Tokens.COLON)
-                self.expr()
-
-            else:
-                self.expr()
-                self.eat(Tokens.COLON)
-                right = self.expr()
-
+        right = self.conditional()
 
         node = Assign(left, token, right)
+        if self.analyzer is not None:
+            self.analyzer.assign(node)
         return node
     
 
+    def conditional(self):
+        """ conditional: expr (TERNARY expr COLON expr)? """
+        node = self.expr()
+        if(self.current_token.type == Tokens.TERNARY):
+            token = self.current_token
+            self.eat(Tokens.TERNARY)
+            true_expr = self.expr()
+            self.eat(Tokens.COLON)
+            node = Ternary(node, token, true_expr, self.expr())
+            if self.analyzer is not None:
+                self.analyzer.infer(node)
+
+        return node
+
+
     def variable(self):
         """ variable: ID """
 
@@ -286,94 +422,126 @@ class Parser:
 
 
     # PARSING NUMBERS AND EXPRESSIONS (part 7-8)
-    def factor(self):
-        """ factor : PLUS  factor
-                    | MINUS factor
-                    | INTEGER_CONST
-                    | REAL_CONST
-                    | LPAREN expr RPAREN
-                    | variable
+    def expr(self):
         """
+        expr   : term ((PLUS | MINUS) term)*
+        term   : factor ((MUL | INTEGER_DIV | FLOAT_DIV) factor)*
+        factor : PLUS factor
+               | MINUS factor
+               | INTEGER_CONST
+               | REAL_CONST
+               | LPAREN expr RPAREN
+               | variable
+
+        parsed with an operand and an operator stack (shunting-yard) instead
+        of a method per rule, so the nesting of parentheses and unary
+        operators is limited by memory, not the recursion limit. the tree is
+        the one the grammar gives.
+        """
+        analyzer = self.analyzer
+        operands = []
+        operators = [] # (precedence, token), PREFIX_PRECEDENCE or BINARY_PRECEDENCE
+        depth = 0 # open parentheses
 
-        token = self.current_token
-        if(token.type == Tokens.PLUS):
-            self.eat(Tokens.PLUS)
-            node = UnaryOp(token, self.factor())
-            return node
-
-        if(token.type == Tokens.MINUS):
-            self.eat(Tokens.MINUS)
-            node = UnaryOp(token, self.factor())
-            return node
-
-        if(token.type == Tokens.INT_CONST):
-            self.eat(Tokens.INT_CONST)
-            return Num(token)
-
-        if(token.type == Tokens.REAL_CONST):
-            self.eat(Tokens.REAL_CONST)
-            return Num(token)
-
-        elif(token.type == Tokens.LPAREN):
-            self.eat(Tokens.LPAREN)
-            node = self.expr()
-            self.eat(Tokens.RPAREN)
-            return node
-
-        else:
-            node = self.variable()
-            return node
-
-
-
-    def term(self):
-        """ term: factor ((MUL | INTDIV | FLOATDIV) factor """
-        node = self.factor()
-
-        while(self.current_token.type in (Tokens.MUL, Tokens.FLOATDIV, Tokens.DIV.type)):
+        while True:
+            # factor: prefix operators and parentheses, then a number or a variable
             token = self.current_token
-            if(token.type == Tokens.MUL):
-                self.eat(Tokens.MUL)
-
-            elif(token.type == Tokens.FLOATDIV):
-                self.eat(Tokens.FLOATDIV)
-
-            elif(token.type == Tokens.DIV.type): # INT DIV
-                self.eat(Tokens.DIV.type)
+            while(token.type in PREFIX_PRECEDENCE):
+                self.eat(token.type)
+                operators.append((PREFIX_PRECEDENCE[token.type], token))
+                if(token.type == Tokens.LPAREN):
+                    depth += 1
+                token = self.current_token
+
+            if(token.type in (Tokens.INT_CONST, Tokens.REAL_CONST)):
+                self.eat(token.type)
+                operands.append(Num(token))
+            else:
+                node = self.variable()
+                if analyzer is not None:
+                    analyzer.resolve(node)
+                operands.append(node)
+
+            # closing parentheses, then a binary operator or the end of the expression
+            while True:
+                token = self.current_token
+                precedence = BINARY_PRECEDENCE.get(token.type, 0)
+                # operators binding as tight or tighter are done (left associative)
+                bound = max(precedence, 1)
+                while(operators and operators[-1][0] >= bound):
+                    op_precedence, op = operators.pop()
+                    if(op_precedence == UNARY_PRECEDENCE):
+                        node = UnaryOp(op, operands[-1])
+                    else:
+                        right = operands.pop()
+                        node = BinOp(left=operands[-1], op=op, right=right)
+                    operands[-1] = node
+                    if analyzer is not None:
+                        analyzer.infer(node)
+
+                if precedence:
+                    self.eat(token.type)
+                    operators.append((precedence, token))
+                    break
+
+                if(depth and token.type == Tokens.RPAREN):
+                    self.eat(Tokens.RPAREN)
+                    operators.pop() # the LPAREN
+                    depth -= 1
+                    continue
+
+                if depth:
+                    self.eat(Tokens.RPAREN) # a parenthesis left open
+                return operands[0]
 
 
-            node = BinOp(left=node, op=token, right=self.factor())
+    def parse(self):
+        node = self.program()
+        if self.current_token.type != Tokens.EOF:
+            self.error() # program should end at "END ."
 
         return node
 
 
 
-    def expr(self):
-        """
-        expr   : term ((PLUS | MINUS) term)*
-        term   : factor ((MUL | DIV) factor)*
-        factor : INTEGER | LPAREN expr RPAREN
+    def parse_stream(self):
+        """ (program, statements) with the main block's statements parsed lazily
+
+            the header and declarations are parsed and analyzed here; program
+            is the Program node with an empty compound statement and
+            statements a generator of the top-level statements of the main
+            compound statement, each parsed and analyzed when it is asked for,
+            so only the statement being run has to be in memory. a syntax
+            error after the declarations is raised by the generator, once the
+            statements before it have been taken. needs an analyzer: the
+            statements are run without a separate SemanticAnalyzer pass.
         """
-        node = self.term()
+        if self.analyzer is None:
+            raise ValueError("parse_stream() needs a SemanticAnalyzer")
 
-        while(self.current_token.type in (Tokens.PLUS, Tokens.MINUS)):
-            token = self.current_token
-            if(token.type == Tokens.PLUS):
-                self.eat(Tokens.PLUS)
-            else:
-                self.eat(Tokens.MINUS)
+        self.eat(Tokens.PROGRAM)
+        prog_name = self.variable().value
+        self.eat(Tokens.SEMI)
 
-            node = BinOp(left=node, op=token, right=self.term())
+        self.analyzer.enter_scope("global")
+        block_node = Block(self.declarations(), Compound())
+        block_node.scope = self.analyzer.current_scope
+        return Program(prog_name, block_node), self._main_statements()
 
-        return node
 
+    def _main_statements(self):
+        """ BEGIN statement_list END DOT, yielding the statements """
+        self.eat(Tokens.BEGIN)
+        yield self.statement()
+        while self.current_token.type == Tokens.SEMI:
+            self.eat(Tokens.SEMI)
+            yield self.statement()
 
-    def parse(self):
-        node = self.program()
+        self.eat(Tokens.END)
+        self.analyzer.leave_scope()
+        self.eat(Tokens.DOT)
         if self.current_token.type != Tokens.EOF:
-            self.error() # program should end at "END ."
-
-        return node
+            self.error()
 
 
 
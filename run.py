@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+""" Command line of the Pascal interpreter
+
+    $ python run.py program.pas
+    $ python run.py program.pas --profile --stats --stream ...
+    $ python run.py              (an expression REPL)
+
+    a module of its own so the trees ASTCache pickles refer to the classes of
+    interpreter, not of __main__.
+"""
+import argparse
+
+from cache import ASTCache
+from interpreter import Interpreter, ProfilingInterpreter, load_program, stream_program
+
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(description="Pascal interpreter, a REPL without a file")
+    argparser.add_argument("path", nargs="?", help="Pascal source file")
+    argparser.add_argument("--no-cache", action="store_true", help="don't load or store the analyzed tree in __lsbasicache__ (the first run of a file pickles its tree, which costs about as much as the front end)")
+    argparser.add_argument("--profile", action="store_true", help="time the run, print the hot spots")
+    argparser.add_argument("--profile-stacks", metavar="PATH", help="write the collapsed stacks for flamegraph.pl, implies --profile")
+    argparser.add_argument("--stats", action="store_true", help="run the phases one by one and print their times and sizes as JSON")
+    argparser.add_argument("--stream", action="store_true", help="run the main block statement by statement as it is parsed, without a whole tree or the cache")
+    args = argparser.parse_args(argv)
+    profile = args.profile or args.profile_stacks is not None
+
+    if(args.path is not None and args.stats):
+        from stats import PipelineStats
+        print(PipelineStats.run_path(args.path).to_json())
+
+    elif(args.path is not None and args.stream):
+        interpreter = Interpreter(None)
+        interpreter.interpret_stream(*stream_program(args.path))
+        print("MEMORY contents:")
+        print(interpreter.GLOBAL_SCOPE)
+
+    elif(args.path is not None):
+        print(args.path)
+        cache = None if args.no_cache else ASTCache.for_source(args.path)
+        tree = load_program(args.path, cache)
+        print("Symbol Table contents:")
+        print(tree.block.scope)
+
+
+
+        interpreter = (ProfilingInterpreter if profile else Interpreter)(tree)
+        interpreter.interpret()
+        print("MEMORY contents:")
+        print(interpreter.GLOBAL_SCOPE)
+
+        if profile:
+            print(interpreter.report())
+            if args.profile_stacks:
+                with open(args.profile_stacks, "w") as f:
+                    f.write(interpreter.collapsed())
+
+
+    else:
+        from embed import evaluate
+
+        while True:
+            text = input("cal> ")
+            if(text == "exit"):
+                break
+            try:
+                # compiled once per distinct line, see embed.ExpressionCache
+                result = evaluate(text)
+            except Exception as e:
+                print("{}: {}".format(type(e).__name__, e))
+            else:
+                print(result)
+
+
+
+if(__name__ == "__main__"):
+    main()
@@ -1,43 +1,57 @@
 """ SPI - Simple Pascal Interpreter. Part 11."""
 
+import operator
+from collections import defaultdict
+from time import perf_counter_ns
+
 ###############################################################################
 #                                                                             #
 #  LEXER                                                                      #
 #                                                                             #
 ###############################################################################
 
-# Token types
+# Token types, small integer codes
 #
 # EOF (end-of-file) token is used to indicate that
 # there is no more input left for lexical analysis
-INTEGER       = 'INTEGER'
-REAL          = 'REAL'
-INTEGER_CONST = 'INTEGER_CONST'
-REAL_CONST    = 'REAL_CONST'
-PLUS          = 'PLUS'
-MINUS         = 'MINUS'
-MUL           = 'MUL'
-INTEGER_DIV   = 'INTEGER_DIV'
-FLOAT_DIV     = 'FLOAT_DIV'
-LPAREN        = 'LPAREN'
-RPAREN        = 'RPAREN'
-ID            = 'ID'
-ASSIGN        = 'ASSIGN'
-BEGIN         = 'BEGIN'
-END           = 'END'
-SEMI          = 'SEMI'
-DOT           = 'DOT'
-PROGRAM       = 'PROGRAM'
-VAR           = 'VAR'
-COLON         = 'COLON'
-COMMA         = 'COMMA'
-EOF           = 'EOF'
+INTEGER       = 0
+REAL          = 1
+INTEGER_CONST = 2
+REAL_CONST    = 3
+PLUS          = 4
+MINUS         = 5
+MUL           = 6
+INTEGER_DIV   = 7
+FLOAT_DIV     = 8
+LPAREN        = 9
+RPAREN        = 10
+ID            = 11
+ASSIGN        = 12
+BEGIN         = 13
+END           = 14
+SEMI          = 15
+DOT           = 16
+PROGRAM       = 17
+VAR           = 18
+COLON         = 19
+COMMA         = 20
+EOF           = 21
+
+TOKEN_NAMES = {
+    value: name for name, value in list(globals().items())
+    if name.isupper() and isinstance(value, int)
+}
 
 
 class Token(object):
-    def __init__(self, type, value):
+    __slots__ = ('type', 'value', 'offset', 'line', 'column')
+
+    def __init__(self, type, value, offset=0, line=0, column=0):
         self.type = type
         self.value = value
+        self.offset = offset  # index of the first character in the text
+        self.line = line
+        self.column = column
 
     def __str__(self):
         """String representation of the class instance.
@@ -48,7 +62,7 @@ class Token(object):
             Token(MUL, '*')
         """
         return 'Token({type}, {value})'.format(
-            type=self.type,
+            type=TOKEN_NAMES[self.type],
             value=repr(self.value)
         )
 
@@ -57,13 +71,13 @@ class Token(object):
 
 
 RESERVED_KEYWORDS = {
-    'PROGRAM': Token('PROGRAM', 'PROGRAM'),
-    'VAR': Token('VAR', 'VAR'),
-    'DIV': Token('INTEGER_DIV', 'DIV'),
-    'INTEGER': Token('INTEGER', 'INTEGER'),
-    'REAL': Token('REAL', 'REAL'),
-    'BEGIN': Token('BEGIN', 'BEGIN'),
-    'END': Token('END', 'END'),
+    'PROGRAM': Token(PROGRAM, 'PROGRAM'),
+    'VAR': Token(VAR, 'VAR'),
+    'DIV': Token(INTEGER_DIV, 'DIV'),
+    'INTEGER': Token(INTEGER, 'INTEGER'),
+    'REAL': Token(REAL, 'REAL'),
+    'BEGIN': Token(BEGIN, 'BEGIN'),
+    'END': Token(END, 'END'),
 }
 
 class Lexer(object):
@@ -72,6 +86,8 @@ class Lexer(object):
         self.text = text
         # self.pos is an index into self.text
         self.pos = 0
+        self.line = 1
+        self.column = 1
         self.current_char = self.text[self.pos]
 
     def error(self):
@@ -79,6 +95,12 @@ class Lexer(object):
 
     def advance(self):
         """Advance the `pos` pointer and set the `current_char` variable."""
+        if self.current_char == '\n':
+            self.line += 1
+            self.column = 1
+        else:
+            self.column += 1
+
         self.pos += 1
         if self.pos > len(self.text) - 1:
             self.current_char = None  # Indicates end of input
@@ -103,6 +125,7 @@ class Lexer(object):
 
     def number(self):
         """Return a (multidigit) integer or float consumed from the input."""
+        offset, line, column = self.pos, self.line, self.column
         result = ''
         while self.current_char is not None and self.current_char.isdigit():
             result += self.current_char
@@ -119,21 +142,25 @@ class Lexer(object):
                 result += self.current_char
                 self.advance()
 
-            token = Token('REAL_CONST', float(result))
+            token = Token(REAL_CONST, float(result), offset, line, column)
         else:
-            token = Token('INTEGER_CONST', int(result))
+            token = Token(INTEGER_CONST, int(result), offset, line, column)
 
         return token
 
     def _id(self):
         """Handle identifiers and reserved keywords"""
+        offset, line, column = self.pos, self.line, self.column
         result = ''
         while self.current_char is not None and self.current_char.isalnum():
             result += self.current_char
             self.advance()
 
-        token = RESERVED_KEYWORDS.get(result, Token(ID, result))
-        return token
+        # a new token for every keyword, each has its own position
+        keyword = RESERVED_KEYWORDS.get(result)
+        if keyword is None:
+            return Token(ID, result, offset, line, column)
+        return Token(keyword.type, keyword.value, offset, line, column)
 
     def get_next_token(self):
         """Lexical analyzer (also known as scanner or tokenizer)
@@ -152,6 +179,8 @@ class Lexer(object):
                 self.skip_comment()
                 continue
 
+            offset, line, column = self.pos, self.line, self.column
+
             if self.current_char.isalpha():
                 return self._id()
 
@@ -161,51 +190,51 @@ class Lexer(object):
             if self.current_char == ':' and self.peek() == '=':
                 self.advance()
                 self.advance()
-                return Token(ASSIGN, ':=')
+                return Token(ASSIGN, ':=', offset, line, column)
 
             if self.current_char == ';':
                 self.advance()
-                return Token(SEMI, ';')
+                return Token(SEMI, ';', offset, line, column)
 
             if self.current_char == ':':
                 self.advance()
-                return Token(COLON, ':')
+                return Token(COLON, ':', offset, line, column)
 
             if self.current_char == ',':
                 self.advance()
-                return Token(COMMA, ',')
+                return Token(COMMA, ',', offset, line, column)
 
             if self.current_char == '+':
                 self.advance()
-                return Token(PLUS, '+')
+                return Token(PLUS, '+', offset, line, column)
 
             if self.current_char == '-':
                 self.advance()
-                return Token(MINUS, '-')
+                return Token(MINUS, '-', offset, line, column)
 
             if self.current_char == '*':
                 self.advance()
-                return Token(MUL, '*')
+                return Token(MUL, '*', offset, line, column)
 
             if self.current_char == '/':
                 self.advance()
-                return Token(FLOAT_DIV, '/')
+                return Token(FLOAT_DIV, '/', offset, line, column)
 
             if self.current_char == '(':
                 self.advance()
-                return Token(LPAREN, '(')
+                return Token(LPAREN, '(', offset, line, column)
 
             if self.current_char == ')':
                 self.advance()
-                return Token(RPAREN, ')')
+                return Token(RPAREN, ')', offset, line, column)
 
             if self.current_char == '.':
                 self.advance()
-                return Token(DOT, '.')
+                return Token(DOT, '.', offset, line, column)
 
             self.error()
 
-        return Token(EOF, None)
+        return Token(EOF, None, self.pos, self.line, self.column)
 
 
 ###############################################################################
@@ -222,6 +251,7 @@ class BinOp(AST):
         self.left = left
         self.token = self.op = op
         self.right = right
+        self.impl = None  # set by SymbolTableBuilder
 
 
 class Num(AST):
@@ -550,11 +580,53 @@ class Parser(object):
 #                                                                             #
 ###############################################################################
 
+def _ast_classes(cls):
+    """All subclasses of an AST class."""
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from _ast_classes(subclass)
+
+
 class NodeVisitor(object):
+    """visit(node) calls self.visit_<NodeClass>(node).
+
+    The method is looked up once per visitor class and node class and kept
+    in the class' _dispatch table: the AST classes above are resolved when
+    the visitor class is created, other node classes through their MRO on
+    first visit. Only class attributes count: a visit_X set on an instance
+    is never called, override it in a subclass instead.
+
+    A copy of interpreter.NodeVisitor and _ast_classes(), so this file runs
+    on its own; keep the two in sync.
+    """
+    _dispatch = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._dispatch = {}
+        for node_class in _ast_classes(AST):
+            method = getattr(cls, 'visit_' + node_class.__name__, None)
+            if method is not None:
+                cls._dispatch[node_class] = method
+
     def visit(self, node):
-        method_name = 'visit_' + type(node).__name__
-        visitor = getattr(self, method_name, self.generic_visit)
-        return visitor(node)
+        try:
+            visitor = self._dispatch[node.__class__]
+        except KeyError:
+            visitor = self._resolve(node.__class__)
+        return visitor(self, node)
+
+    @classmethod
+    def _resolve(cls, node_class):
+        for klass in node_class.__mro__:
+            method = getattr(cls, 'visit_' + klass.__name__, None)
+            if method is not None:
+                break
+        else:
+            method = cls.generic_visit
+
+        cls._dispatch[node_class] = method
+        return method
 
     def generic_visit(self, node):
         raise Exception('No visit_{} method'.format(type(node).__name__))
@@ -592,9 +664,77 @@ class BuiltinTypeSymbol(Symbol):
     __repr__ = __str__
 
 
-class SymbolTable(object):
+class SymbolTracer(object):
+    """Hook for symbol table events, pass one as SymbolTable(tracer=...).
+
+    Tables without a tracer don't time or report anything. The same hooks
+    as interpreter.SymbolTracer, keep the two in sync.
+    """
+    def define(self, table, symbol):
+        pass
+
+    def lookup(self, table, name, symbol, elapsed_ns):
+        """symbol is None on a miss."""
+        pass
+
+
+class PrintTracer(SymbolTracer):
+    """Prints every define and lookup."""
+    def define(self, table, symbol):
+        print('Define: %s' % symbol)
+
+    def lookup(self, table, name, symbol, elapsed_ns):
+        print('Lookup: %s' % name)
+
+
+def scope_path(scope):
+    """The scope's name after the names of the scopes around it, "global.P1.P2".
+
+    A table without a scope name is "global". The same as
+    interpreter.scope_path, keep the two in sync.
+    """
+    names = []
+    while scope is not None:
+        names.append(getattr(scope, 'scope_name', 'global'))
+        scope = getattr(scope, 'enclosing_scope', None)
+    return '.'.join(reversed(names))
+
+
+class SymbolStats(SymbolTracer):
+    """Counts defines, lookups, hits and misses and lookup time per scope.
+
+    Scopes are keyed by scope_path(), so procedures of the same name in
+    different scopes are counted apart.
+    """
     def __init__(self):
+        self.scopes = defaultdict(
+            lambda: dict(defines=0, lookups=0, hits=0, misses=0, lookup_ns=0)
+        )
+
+    def __str__(self):
+        return '\n'.join(
+            '{scope}: {defines} defines, {lookups} lookups '
+            '({hits} hits, {misses} misses), {lookup_ns} ns'.format(
+                scope=scope, **counts)
+            for scope, counts in self.scopes.items()
+        )
+
+    __repr__ = __str__
+
+    def define(self, table, symbol):
+        self.scopes[scope_path(table)]['defines'] += 1
+
+    def lookup(self, table, name, symbol, elapsed_ns):
+        counts = self.scopes[scope_path(table)]
+        counts['lookups'] += 1
+        counts['hits' if symbol is not None else 'misses'] += 1
+        counts['lookup_ns'] += elapsed_ns
+
+
+class SymbolTable(object):
+    def __init__(self, tracer=None):
         self._symbols = {}
+        self.tracer = tracer
         self._init_builtins()
 
     def _init_builtins(self):
@@ -610,19 +750,40 @@ class SymbolTable(object):
     __repr__ = __str__
 
     def define(self, symbol):
-        print('Define: %s' % symbol)
+        if self.tracer is not None:
+            self.tracer.define(self, symbol)
         self._symbols[symbol.name] = symbol
 
     def lookup(self, name):
-        print('Lookup: %s' % name)
-        symbol = self._symbols.get(name)
         # 'symbol' is either an instance of the Symbol class or 'None'
+        if self.tracer is None:
+            return self._symbols.get(name)
+
+        start = perf_counter_ns()
+        symbol = self._symbols.get(name)
+        self.tracer.lookup(self, name, symbol, perf_counter_ns() - start)
         return symbol
 
 
+# operation for each operator, chosen once per BinOp by SymbolTableBuilder
+BINARY_OPERATORS = {
+    PLUS: operator.add,
+    MINUS: operator.sub,
+    MUL: operator.mul,
+    INTEGER_DIV: operator.floordiv,
+    FLOAT_DIV: operator.truediv,
+}
+
+
 class SymbolTableBuilder(NodeVisitor):
-    def __init__(self):
-        self.symtab = SymbolTable()
+    """Builds the symbol table and type checks the program.
+
+    The visit methods for expressions return their static type name,
+    INTEGER or REAL. A REAL assigned to an INTEGER variable and a DIV of a
+    REAL are TypeErrors. Each BinOp gets its operation as node.impl.
+    """
+    def __init__(self, tracer=None):
+        self.symtab = SymbolTable(tracer)
 
     def visit_Block(self, node):
         for declaration in node.declarations:
@@ -633,14 +794,22 @@ class SymbolTableBuilder(NodeVisitor):
         self.visit(node.block)
 
     def visit_BinOp(self, node):
-        self.visit(node.left)
-        self.visit(node.right)
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        node.impl = BINARY_OPERATORS[node.op.type]
+        if node.op.type == FLOAT_DIV:
+            return 'REAL'
+        if 'REAL' in (left, right):
+            if node.op.type == INTEGER_DIV:
+                raise TypeError('DIV of a REAL, expected INTEGER operands')
+            return 'REAL'
+        return 'INTEGER'
 
     def visit_Num(self, node):
-        pass
+        return 'INTEGER' if node.token.type == INTEGER_CONST else 'REAL'
 
     def visit_UnaryOp(self, node):
-        self.visit(node.expr)
+        return self.visit(node.expr)
 
     def visit_Compound(self, node):
         for child in node.children:
@@ -662,7 +831,11 @@ class SymbolTableBuilder(NodeVisitor):
         if var_symbol is None:
             raise NameError(repr(var_name))
 
-        self.visit(node.right)
+        value_type = self.visit(node.right)
+        if var_symbol.type.name == 'INTEGER' and value_type == 'REAL':
+            raise TypeError(
+                'REAL assigned to INTEGER variable {}'.format(repr(var_name))
+            )
 
     def visit_Var(self, node):
         var_name = node.value
@@ -670,6 +843,7 @@ class SymbolTableBuilder(NodeVisitor):
 
         if var_symbol is None:
             raise NameError(repr(var_name))
+        return var_symbol.type.name
 
 
 ###############################################################################
@@ -700,6 +874,10 @@ class Interpreter(NodeVisitor):
         pass
 
     def visit_BinOp(self, node):
+        impl = node.impl
+        if impl is not None:
+            return impl(self.visit(node.left), self.visit(node.right))
+
         if node.op.type == PLUS:
             return self.visit(node.left) + self.visit(node.right)
         elif node.op.type == MINUS:
@@ -709,7 +887,7 @@ class Interpreter(NodeVisitor):
         elif node.op.type == INTEGER_DIV:
             return self.visit(node.left) // self.visit(node.right)
         elif node.op.type == FLOAT_DIV:
-            return float(self.visit(node.left)) / float(self.visit(node.right))
+            return self.visit(node.left) / self.visit(node.right)
 
     def visit_Num(self, node):
         return node.value
@@ -0,0 +1,162 @@
+""" Phase timings and sizes of one run of the pipeline
+
+    stats = PipelineStats.run_path("program.pas")
+    print(stats.to_json())
+
+    or python run.py program.pas --stats
+"""
+import json
+import time
+import tracemalloc
+from collections import Counter
+
+from tokens import Tokens
+from lexer import Lexer
+from incremental import TokenList
+from parser import Parser, AST, Block, BinOp, UnaryOp, Var, Num
+from optimizer import ConstantFolder
+from interpreter import Interpreter, SemanticAnalyzer, NODE_KINDS, postorder, scope_path
+
+
+PHASES = ("lex", "parse", "analyze", "fold", "interpret")
+
+
+
+def walk(node):
+    """ every AST node of a tree, with an explicit stack """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        for cls in node.__class__.__mro__:
+            for name in cls.__dict__.get("__slots__", ()):
+                value = getattr(node, name, None)
+                if isinstance(value, AST):
+                    stack.append(value)
+                elif isinstance(value, list):
+                    stack.extend(child for child in value if isinstance(child, AST))
+
+
+
+def lex(text):
+    """ the tokens of the default Lexer(text), EOF included """
+    lexer = Lexer(text)
+    tokens = [lexer.get_next_token()]
+    while(tokens[-1].type != Tokens.EOF):
+        tokens.append(lexer.get_next_token())
+    return tokens
+
+
+
+class _CountingInterpreter(Interpreter):
+    """ Interpreter that counts the nodes it evaluates in steps """
+    def __init__(self, tree):
+        super().__init__(tree)
+        self.steps = 0
+
+    def visit(self, node):
+        self.steps += 1
+        return super().visit(node)
+
+    def evaluate(self, node):
+        # evaluate() runs these without visit(), the rest it visits
+        self.steps += sum(
+            NODE_KINDS[operand.__class__] in (BinOp, UnaryOp, Var, Num)
+            for operand in postorder(node)
+        )
+        return super().evaluate(node)
+
+
+
+class PipelineStats:
+    """ Wall time and peak traced memory per phase, and the sizes of the run
+
+        phases      {phase: {"seconds": ..., "peak_bytes": ...}} for the PHASES
+                    run, peak_bytes above what was traced as the phase
+                    started, so the tokens and trees of the earlier phases
+                    don't count
+        tokens      the token count, EOF not included
+        nodes       AST node count by class after parsing
+        symbols     symbol count by scope path, see scope_path(), the
+                    builtin types included
+        steps       the nodes the interpreter evaluated
+
+        the phases run one after the other, not fused like load_program()
+        does: lex is the default Lexer(text) run to the end, parse is Parser
+        over those tokens replayed from a list, so together they are
+        Parser(Lexer(text)).parse() without the interleaving. with
+        memory=True tracemalloc traces them, which slows them down.
+    """
+    def __init__(self):
+        self.phases = {}
+        self.tokens = 0
+        self.nodes = Counter()
+        self.symbols = {}
+        self.steps = 0
+        self.memory = None # the program's variables after the run
+
+
+    def measure(self, phase, memory, function, *args):
+        """ run function(*args) as `phase`, return its result """
+        if memory:
+            tracemalloc.reset_peak()
+            traced = tracemalloc.get_traced_memory()[0] # what the earlier phases left
+        start = time.perf_counter()
+        result = function(*args)
+        seconds = time.perf_counter() - start
+        self.phases[phase] = dict(
+            seconds=round(seconds, 6),
+            peak_bytes=tracemalloc.get_traced_memory()[1] - traced if memory else None,
+        )
+        return result
+
+
+    @classmethod
+    def run(cls, text, memory=True):
+        """ lex, parse, analyze, fold and interpret text, measuring each phase """
+        stats = cls()
+        tracing = memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        try:
+            tokens = stats.measure("lex", memory, lex, text)
+            stats.tokens = len(tokens) - 1
+            tree = stats.measure("parse", memory, Parser(TokenList(tokens)).parse)
+            stats.nodes.update(NODE_KINDS[node.__class__].__name__ for node in walk(tree))
+            stats.measure("analyze", memory, SemanticAnalyzer().visit, tree)
+            stats.symbols = {
+                scope_path(node.scope): len(node.scope._symbols)
+                for node in walk(tree) if isinstance(node, Block)
+            }
+            tree = stats.measure("fold", memory, ConstantFolder(tree).fold)
+            interpreter = _CountingInterpreter(tree)
+            stats.measure("interpret", memory, interpreter.interpret)
+        finally:
+            if tracing:
+                tracemalloc.stop()
+
+        stats.steps = interpreter.steps
+        stats.memory = interpreter.GLOBAL_SCOPE
+        return stats
+
+
+    @classmethod
+    def run_path(cls, path, memory=True):
+        with open(path) as f:
+            return cls.run(f.read(), memory)
+
+
+    def as_dict(self):
+        return dict(
+            phases=self.phases,
+            seconds=round(sum(phase["seconds"] for phase in self.phases.values()), 6),
+            tokens=self.tokens,
+            nodes=dict(sorted(self.nodes.items())),
+            node_count=sum(self.nodes.values()),
+            symbols=self.symbols,
+            steps=self.steps,
+        )
+
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.as_dict(), **kwargs)
@@ -0,0 +1,79 @@
+""" run_batch gives every status with its seconds, and replaces lost workers """
+import multiprocessing
+import os
+import signal
+import threading
+
+import pytest
+
+from batch import run_batch
+
+
+GOOD = "PROGRAM Good; VAR a : INTEGER; BEGIN a := 6 * 7 END."
+BAD = "PROGRAM Bad; BEGIN a := 1 END." # a is not declared
+
+needs_fifo = pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="a FIFO stands for a program that never ends")
+
+
+
+@pytest.fixture
+def programs(tmp_path):
+    """ path of a program by name: good, bad, or stuck, a FIFO nothing writes to """
+    paths = {}
+    for name, text in (("good", GOOD), ("bad", BAD)):
+        path = paths[name] = str(tmp_path / (name + ".pas"))
+        with open(path, "w") as f:
+            f.write(text)
+    if hasattr(os, "mkfifo"):
+        paths["stuck"] = str(tmp_path / "stuck.pas")
+        os.mkfifo(paths["stuck"]) # opening it blocks the worker
+    return paths
+
+
+
+def by_path(results):
+    results = list(results)
+    assert all("seconds" in result for result in results)
+    return {os.path.basename(result["path"]): result for result in results}
+
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_ok_and_error(programs, workers):
+    results = by_path(run_batch([programs["good"], programs["bad"]], workers=workers))
+    assert results["good.pas"]["status"] == "ok"
+    assert results["good.pas"]["memory"] == {"a": 42}
+    assert results["bad.pas"]["status"] == "error"
+    assert results["bad.pas"]["error"] == "NameError: 'a'"
+
+
+
+def test_no_timeout_in_this_process(programs):
+    with pytest.raises(ValueError):
+        list(run_batch([programs["good"]], workers=0, timeout=1))
+
+
+
+@needs_fifo
+def test_timeout_replaces_the_worker(programs):
+    results = by_path(run_batch([programs["stuck"], programs["good"]], workers=1, timeout=0.5))
+    assert results["stuck.pas"]["status"] == "timeout"
+    assert results["good.pas"]["status"] == "ok" # run by the new worker
+
+
+
+@needs_fifo
+def test_crash_replaces_the_worker(programs):
+    def kill_the_worker():
+        for process in multiprocessing.active_children():
+            os.kill(process.pid, signal.SIGKILL)
+
+    killer = threading.Timer(0.5, kill_the_worker)
+    killer.start()
+    try:
+        results = by_path(run_batch([programs["stuck"], programs["good"]], workers=1))
+    finally:
+        killer.cancel()
+    assert results["stuck.pas"]["status"] == "crashed"
+    assert results["stuck.pas"]["exitcode"] == -signal.SIGKILL
+    assert results["good.pas"]["status"] == "ok"
@@ -0,0 +1,75 @@
+""" ASTCache gives back what it stored, and a bad entry is a miss """
+import pickle
+
+import pytest
+
+import cache
+from cache import ASTCache, source_key
+from interpreter import Interpreter, load_program
+
+
+PROGRAM = """
+PROGRAM Cached;
+VAR a : INTEGER; x : REAL;
+BEGIN
+    a := 2 * 3;
+    x := a / 4
+END.
+"""
+
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "program.pas"
+    path.write_text(PROGRAM)
+    return str(path)
+
+
+
+def run(tree):
+    interpreter = Interpreter(tree)
+    interpreter.interpret()
+    return interpreter.GLOBAL_SCOPE
+
+
+
+def test_a_stored_tree_is_loaded(source):
+    store = ASTCache.for_source(source)
+    tree = load_program(source, store)
+    assert store.load(source_key(source)) is not None
+    assert run(load_program(source, store)) == run(tree) == {"a": 6, "x": 1.5}
+
+
+
+class Gone:
+    pass
+
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"not a pickle",
+    pickle.dumps(list(range(100)))[:-10], # truncated
+    pickle.dumps(Gone()).replace(b"Gone", b"Lost"), # a class that no longer exists
+    pickle.dumps(Gone()).replace(Gone.__module__.encode(), b"x" * len(Gone.__module__)), # a module
+])
+def test_a_corrupt_entry_is_a_miss(source, data):
+    store = ASTCache.for_source(source)
+    key = source_key(source)
+    store.store(key, None) # makes the directory
+    with open(store.path(key), "wb") as f:
+        f.write(data)
+    assert store.load(key) is None
+    assert run(load_program(source, store)) == {"a": 6, "x": 1.5}
+
+
+
+def test_a_new_cache_version_misses_the_old_entries(source, monkeypatch):
+    store = ASTCache.for_source(source)
+    load_program(source, store)
+    old = source_key(source)
+
+    monkeypatch.setattr(cache, "CACHE_VERSION", cache.CACHE_VERSION + b"-next")
+    assert source_key(source) != old
+    assert store.load(source_key(source)) is None
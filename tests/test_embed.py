@@ -0,0 +1,81 @@
+""" compiled expressions, the LRU that keeps them and its locking """
+import threading
+
+import pytest
+
+from embed import ExpressionCache, compile_expression, evaluate
+
+
+def test_expression_with_its_variables():
+    expression = compile_expression("a * (b + 2) - a DIV 2")
+    assert expression({"a": 5, "b": 1}) == 13
+    assert evaluate("a ? b / 2 : c", {"a": 0, "b": 1, "c": 7}, ExpressionCache()) == 7
+
+
+
+@pytest.mark.parametrize("text, env", [
+    ("y + 1", None),
+    ("x * y", {"x": 2}),
+    ("x ? y : 1", {"x": 1}),
+])
+def test_missing_variable_is_a_name_error(text, env):
+    with pytest.raises(NameError, match="y"):
+        compile_expression(text)(env)
+
+
+
+def test_unselected_missing_variable_is_not_read():
+    assert compile_expression("x ? 1 : y")({"x": 1}) == 1
+
+
+
+def test_expression_deeper_than_the_recursion_limit():
+    terms = 5000
+    assert evaluate("+".join(["x"] * terms), {"x": 2}, ExpressionCache()) == 2 * terms
+    with pytest.raises(NameError):
+        compile_expression("-".join(["x"] * terms))({})
+
+
+
+def test_least_recently_used_is_evicted():
+    cache = ExpressionCache(capacity=2)
+    first = cache.get("a + 1")
+    cache.get("a + 2")
+    assert cache.get("a + 1") is first # now the most recent
+    cache.get("a + 3") # evicts a + 2
+    assert set(cache.entries) == {"a + 1", "a + 3"}
+    assert cache.stats() == dict(size=2, capacity=2, hits=1, misses=3, evictions=1)
+
+    cache.invalidate("a + 1")
+    assert list(cache.entries) == ["a + 3"]
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+
+def test_shared_between_threads():
+    cache = ExpressionCache(capacity=8)
+    texts = ["x * {}".format(i) for i in range(16)]
+    calls = 200
+    errors = []
+
+    def work(offset):
+        try:
+            for i in range(calls):
+                i = (i + offset) % len(texts)
+                assert cache.get(texts[i])({"x": 3}) == 3 * i
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(offset,)) for offset in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert not errors
+    assert stats["hits"] + stats["misses"] == calls * len(threads)
+    assert stats["size"] == len(cache.entries) <= 8
+    # two threads missing the same text store it once
+    assert stats["evictions"] <= stats["misses"] - stats["size"]
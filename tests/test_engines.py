@@ -0,0 +1,153 @@
+""" every execution engine gives the Interpreter's memory, for trees and arena views """
+import os
+import sys
+
+import pytest
+
+from lexer import Lexer
+from parser import Parser
+from interpreter import Interpreter, SemanticAnalyzer
+from compiler import ClosureCompiler
+from bytecode import BytecodeCompiler, VM, disassemble
+from astarena import ASTArena
+from optimizer import ConstantFolder
+from parallel import compile_program
+from stats import walk
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bench"))
+from generate import generate
+
+
+PROGRAM = """
+PROGRAM Engines;
+VAR
+    a, b, c : INTEGER;
+    x, y : REAL;
+BEGIN
+    b := 7;
+    y := b;
+    a := b * 2 + -b;
+    c := (a - 3) DIV 2 * -(b + 1);
+    x := a / 4 + c * 1.5;
+    BEGIN
+        a := a + b * c - (a DIV 3)
+    END
+END.
+"""
+
+
+
+def analyzed(text):
+    tree = Parser(Lexer(text)).parse()
+    SemanticAnalyzer().visit(tree)
+    return tree
+
+
+
+def interpret(tree):
+    interpreter = Interpreter(tree)
+    interpreter.interpret()
+    return interpreter.GLOBAL_SCOPE
+
+
+
+def typed(memory):
+    """ memory with each value paired with its type, 1 == 1.0 but an INTEGER isn't a REAL """
+    return {name: (type(value), value) for name, value in memory.items()}
+
+
+
+ENGINES = {
+    "interpreter": interpret,
+    "closures": lambda tree: ClosureCompiler(tree).compile().run(),
+    "vm": lambda tree: VM().run(BytecodeCompiler(tree).compile()),
+}
+
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_arena_view_runs_like_the_tree(engine):
+    expected = interpret(analyzed(PROGRAM))
+    view = ASTArena.from_tree(analyzed(PROGRAM)).tree()
+    assert typed(ENGINES[engine](view)) == typed(expected)
+
+
+
+def test_arena_flattens_a_tree_deeper_than_the_recursion_limit():
+    terms = 5000
+    text = "PROGRAM Deep; VAR a : INTEGER; BEGIN a := 1; a := {} END.".format("+".join(["a"] * terms))
+    tree = analyzed(text)
+    arena = ASTArena.from_tree(tree)
+    assert len(arena) == sum(1 for _ in walk(tree))
+    # a token per Var and BinOp, one (type, impl) note and symbol for all of them
+    assert len(arena.consts) < len(arena) + 10
+
+
+
+# the front ends and back ends put together differently, each from the text
+PIPELINES = {
+    "closures": lambda text: ClosureCompiler(analyzed(text)).compile().run(),
+    "vm": lambda text: VM().run(BytecodeCompiler(analyzed(text)).compile()),
+    "folded vm": lambda text: VM().run(BytecodeCompiler(ConstantFolder(analyzed(text)).fold()).compile()),
+    "fused parser": lambda text: interpret(Parser(Lexer(text), SemanticAnalyzer()).parse()),
+    "regex lexer": lambda text: interpret(analyzed_buffer(text)),
+    "parallel": lambda text: VM().run(compile_program(text)),
+}
+
+
+
+def analyzed_buffer(text):
+    tree = Parser(Lexer(text, regex=True).tokenize_all().cursor()).parse()
+    SemanticAnalyzer().visit(tree)
+    return tree
+
+
+
+def program(seed):
+    return generate(seed, statements=80, variables=8, procedures=3, nesting=2, depth=5)
+
+
+
+@pytest.mark.parametrize("pipeline", sorted(PIPELINES))
+@pytest.mark.parametrize("seed", range(5))
+def test_generated_programs_run_like_the_interpreter(pipeline, seed):
+    text = program(seed)
+    assert typed(PIPELINES[pipeline](text)) == typed(interpret(analyzed(text)))
+
+
+
+@pytest.mark.parametrize("pipeline", sorted(PIPELINES))
+def test_integer_assigned_to_real_is_real(pipeline):
+    memory = PIPELINES[pipeline](PROGRAM)
+    assert typed(memory) == typed(interpret(analyzed(PROGRAM)))
+    assert type(memory["y"]) is float
+
+
+
+def test_compile_analyzes_an_unanalyzed_tree():
+    tree = Parser(Lexer(PROGRAM)).parse()
+    assert typed(Interpreter(tree).compile().run()) == typed(interpret(analyzed(PROGRAM)))
+
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_parallel_code_is_the_sequential_code(seed):
+    text = program(seed)
+    tree = ConstantFolder(Parser(Lexer(text), SemanticAnalyzer()).parse()).fold()
+    assert disassemble(compile_program(text)) == disassemble(BytecodeCompiler(tree).compile())
+
+
+
+MALFORMED = [
+    "PROGRAM p; VAR a : INTEGER; PROCEDURE P1; a := 1 END; BEGIN END.",
+    "PROGRAM p; PROCEDURE P1; BEGIN BEGIN END; BEGIN END.",
+]
+
+
+
+@pytest.mark.parametrize("text", MALFORMED)
+def test_parallel_rejects_a_malformed_procedure_like_the_parser(text):
+    with pytest.raises(Exception, match="Invalid Syntax"):
+        Parser(Lexer(text), SemanticAnalyzer()).parse()
+    with pytest.raises(Exception, match="Invalid Syntax"):
+        compile_program(text)
@@ -0,0 +1,103 @@
+""" an incremental reparse gives the tree, or the error, of a full parse """
+import random
+
+import pytest
+
+from tokens import Token
+from lexer import Lexer
+from parser import AST, Parser
+from incremental import IncrementalParser
+from stats import walk
+
+
+PROGRAM = """PROGRAM Edits;
+VAR
+    a, b : INTEGER;
+    y : REAL;
+
+PROCEDURE P1;
+VAR
+    k : INTEGER;
+    PROCEDURE P2;
+    BEGIN
+        k := 3 * (k + 1)
+    END;
+BEGIN
+    k := a ? 2 : -3;
+    BEGIN y := k / 2; a := k DIV 2 END
+END;
+
+BEGIN { main }
+    a := 2;
+    b := a * 10 + 7 DIV 2;
+    y := 20 / 7 * b;
+    BEGIN
+        a := (a - b) * -(b + 1);
+        b := a ? b : 1
+    END;
+    y := y + a
+END.
+"""
+
+# what an edit inserts: parts of tokens, whole tokens and invalid characters
+INSERTS = ["a", "b1", "7", "2.5", " ", "\n", ";", ":", "=", ":=", "+", "-", "*", "/",
+           "(", ")", "?", ".", "{", "}", "BEGIN ", " END", "DIV", "!", "_", "é"]
+
+
+
+def dump(tree):
+    """ the nodes of a tree with their tokens and positions, comparable with == """
+    nodes = []
+    for node in walk(tree):
+        fields = [type(node).__name__]
+        for cls in type(node).__mro__:
+            for name in cls.__dict__.get("__slots__", ()):
+                value = getattr(node, name, None)
+                if isinstance(value, Token):
+                    fields.append((value.type, value.value, value.offset, value.line, value.column))
+                elif not isinstance(value, (AST, list)) and value is not None:
+                    fields.append(value)
+        nodes.append(tuple(fields))
+    return nodes
+
+
+
+def full(text):
+    """ dump() of the full parse of text, or the message it raises """
+    try:
+        return dump(Parser(Lexer(text, regex=True)).parse())
+    except Exception as e:
+        return str(e)
+
+
+
+def incremental(parser, offset, deleted, inserted):
+    try:
+        return dump(parser.edit(offset, deleted, inserted))
+    except Exception as e:
+        return str(e)
+
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_edit_and_undo_match_a_full_parse(seed):
+    r = random.Random(seed)
+    parser = IncrementalParser(PROGRAM)
+    for _ in range(150):
+        text = parser.text
+        offset = r.randrange(len(text) + 1)
+        deleted = min(r.choice((0, 0, 1, 2, 5)), len(text) - offset)
+        inserted = "".join(r.choice(INSERTS) for _ in range(r.choice((0, 1, 1, 2))))
+        removed = text[offset:offset + deleted]
+
+        assert incremental(parser, offset, deleted, inserted) == full(parser.text)
+        assert incremental(parser, offset, len(inserted), removed) == full(parser.text)
+        assert parser.text == text
+
+
+
+def test_syntax_error_before_an_invalid_character():
+    parser = IncrementalParser(PROGRAM)
+    offset = PROGRAM.index("b := a * 10")
+    assert incremental(parser, offset, 0, "; := !") == full(parser.text) == "Invalid Syntax"
+    assert incremental(parser, offset, 6, "") == full(PROGRAM)
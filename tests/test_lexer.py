@@ -0,0 +1,120 @@
+""" the streaming lexers give the tokens of the whole text """
+import io
+
+import pytest
+
+from lexer import Lexer
+from tokens import Tokens, RESERVED_KEYWORDS
+
+
+TEXT = "PROGRAM p; VAR héllo : INTEGER; BEGIN héllo := 2 END.\n{ ünïcode } BEGIN x := 1 END"
+
+
+
+def tokens(lexer):
+    return [(t.type, t.value, t.offset, t.line, t.column) for t in lexer]
+
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 64])
+def test_stream_chunks_split_multibyte_characters(chunk_size):
+    stream = io.BytesIO(TEXT.encode("utf-8"))
+    assert tokens(Lexer.from_stream(stream, chunk_size)) == tokens(Lexer(TEXT, regex=True))
+
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 64])
+def test_path_chunks_split_multibyte_characters(tmp_path, chunk_size):
+    path = tmp_path / "program.pas"
+    path.write_bytes(TEXT.encode("utf-8"))
+    assert tokens(Lexer.from_path(str(path), chunk_size)) == tokens(Lexer(TEXT, regex=True))
+
+
+
+def test_text_stream_chunks():
+    assert tokens(Lexer.from_stream(io.StringIO(TEXT), 4)) == tokens(Lexer(TEXT, regex=True))
+
+
+
+def buffer_tokens(buffer):
+    return [(t.type, t.value, t.offset, t.line, t.column) for t in map(buffer.token, range(len(buffer) - 1))]
+
+
+
+def test_tokenize_all_goes_on_from_the_character_engine():
+    lexer = Lexer(TEXT)
+    for _ in range(15): # into the second line
+        lexer.get_next_token()
+    assert buffer_tokens(lexer.tokenize_all()) == tokens(Lexer(TEXT, regex=True))[15:]
+
+
+
+def test_tokenize_all_after_the_regex_engine_read():
+    lexer = Lexer(TEXT, regex=True)
+    lexer.get_next_token()
+    lexer.get_next_token()
+    with pytest.raises(RuntimeError):
+        lexer.tokenize_all()
+
+
+
+def test_tokenize_all_after_seek():
+    expected = tokens(Lexer(TEXT, regex=True))[15:]
+    _, _, offset, line, column = expected[0]
+    lexer = Lexer(TEXT, regex=True)
+    lexer.seek(offset, line, column)
+    assert buffer_tokens(lexer.tokenize_all()) == expected
+
+
+
+def all_tokens(text, engine):
+    """ the tokens of text, EOF left out, from the character or regex engine or tokenize_all() """
+    if(engine == "buffer"):
+        buffer = Lexer(text).tokenize_all()
+        return [buffer.token(i) for i in range(len(buffer) - 1)]
+    return list(Lexer(text, regex=engine == "regex"))
+
+
+
+ENGINES = ["chars", "regex", "buffer"]
+
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("spelling", ["BEGIN", "begin", "Begin", "bEgIn"])
+def test_keywords_are_case_insensitive(engine, spelling):
+    token, = all_tokens(spelling, engine)
+    assert (token.type, token.value) == (Tokens.BEGIN, "BEGIN")
+
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_every_keyword_in_lower_case(engine):
+    text = " ".join(name.lower() for name in RESERVED_KEYWORDS)
+    assert [(t.type, t.value) for t in all_tokens(text, engine)] == list(RESERVED_KEYWORDS.values())
+
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_names_holding_a_keyword_are_identifiers(engine):
+    text = "beginning divisor endx var1 Programs"
+    assert [(t.type, t.value) for t in all_tokens(text, engine)] == \
+        [(Tokens.ID, name) for name in text.split()]
+
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_identifiers_are_interned(engine):
+    # each count is sliced from the text, a new str without interning
+    text = "count := count + count"
+    names = [t.value for t in all_tokens(text, engine) if t.type == Tokens.ID]
+    assert names == ["count"] * 3
+    assert names[0] is names[1] is names[2]
+
+
+
+def test_lexers_share_a_symbol_pool():
+    symbols = {}
+    first = Lexer("alpha", symbols=symbols).get_next_token().value
+    second = Lexer("x + alpha", regex=True, symbols=symbols)
+    assert [t.value for t in second if t.type == Tokens.ID][1] is first
@@ -0,0 +1,106 @@
+""" the iterative Parser.expr() builds the tree of the recursive grammar """
+import random
+
+import pytest
+
+from tokens import Tokens
+from lexer import Lexer
+from parser import BinOp, Num, Parser, UnaryOp, Var
+
+
+class RecursiveParser(Parser):
+    """ expr, term and factor as a method per rule, the way Parser.expr() used to be """
+    def expr(self):
+        node = self.term()
+        while(self.current_token.type in (Tokens.PLUS, Tokens.MINUS)):
+            token = self.current_token
+            self.eat(token.type)
+            node = BinOp(left=node, op=token, right=self.term())
+        return node
+
+
+    def term(self):
+        node = self.factor()
+        while(self.current_token.type in (Tokens.MUL, Tokens.FLOATDIV, Tokens.DIV)):
+            token = self.current_token
+            self.eat(token.type)
+            node = BinOp(left=node, op=token, right=self.factor())
+        return node
+
+
+    def factor(self):
+        token = self.current_token
+        if(token.type in (Tokens.PLUS, Tokens.MINUS)):
+            self.eat(token.type)
+            return UnaryOp(token, self.factor())
+        if(token.type in (Tokens.INT_CONST, Tokens.REAL_CONST)):
+            self.eat(token.type)
+            return Num(token)
+        if(token.type == Tokens.LPAREN):
+            self.eat(Tokens.LPAREN)
+            node = self.expr()
+            self.eat(Tokens.RPAREN)
+            return node
+        return self.variable()
+
+
+
+def shape(node):
+    """ the tree under node as nested tuples of node classes and token positions """
+    if isinstance(node, BinOp):
+        return ("BinOp", node.op.type, node.op.offset, shape(node.left), shape(node.right))
+    if isinstance(node, UnaryOp):
+        return ("UnaryOp", node.op.type, node.op.offset, shape(node.expr))
+    assert isinstance(node, (Num, Var))
+    return (type(node).__name__, node.token.value, node.token.offset)
+
+
+
+def parse(parser_class, text):
+    """ shape() of text parsed as a whole expression, or the message it raises """
+    try:
+        parser = parser_class(Lexer(text))
+        node = parser.expr()
+        if(parser.current_token.type != Tokens.EOF):
+            parser.error()
+        return shape(node)
+    except Exception as e:
+        return str(e)
+
+
+
+def expression(r, depth):
+    if(depth == 0 or r.random() < 0.2):
+        return r.choice(("1", "23", "4.5", "x", "y1"))
+    k = r.random()
+    if(k < 0.15):
+        return r.choice("+-") + expression(r, depth - 1)
+    if(k < 0.3):
+        return "(" + expression(r, depth - 1) + ")"
+    op = r.choice(("+", "-", "*", "/", "DIV"))
+    return "{} {} {}".format(expression(r, depth - 1), op, expression(r, depth - 1))
+
+
+
+def broken(r):
+    """ a few tokens of an expression in any order, mostly not an expression """
+    return " ".join(r.choice(("1", "x", "+", "-", "*", "DIV", "(", ")", "2.5"))
+                    for _ in range(r.randint(1, 8)))
+
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_iterative_expr_matches_the_recursive_grammar(seed):
+    r = random.Random(seed)
+    for _ in range(1000):
+        text = expression(r, r.randint(1, 7))
+        assert parse(Parser, text) == parse(RecursiveParser, text), text
+
+
+
+@pytest.mark.parametrize("seed", range(2))
+def test_iterative_expr_rejects_what_the_grammar_rejects(seed):
+    r = random.Random(seed)
+    for _ in range(1000):
+        text = broken(r)
+        assert parse(Parser, text) == parse(RecursiveParser, text), text
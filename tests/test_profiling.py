@@ -0,0 +1,91 @@
+""" ProfilingInterpreter times the operators without recursing into them """
+import pytest
+
+from lexer import Lexer
+from parser import Parser
+from interpreter import BINARY_OPERATORS, UNARY_OPERATORS, ProfilingInterpreter, SemanticAnalyzer
+
+
+PROGRAM = """
+PROGRAM Profiled;
+VAR
+    a, b : INTEGER;
+    x : REAL;
+BEGIN
+    a := 7;
+    b := -(a + 2) * 3 - a DIV 2;
+    x := a ? b / 4 : -x;
+    BEGIN
+        a := +a - -(b * (a - 1))
+    END
+END.
+"""
+
+
+
+class RecursiveProfiler(ProfilingInterpreter):
+    """ the operators visited recursively, one visit() each """
+    def visit_BinOp(self, node):
+        impl = node.impl or BINARY_OPERATORS[node.op.type]
+        return impl(self.visit(node.left), self.visit(node.right))
+
+
+    def visit_UnaryOp(self, node):
+        impl = node.impl or UNARY_OPERATORS[node.op.type]
+        return impl(self.visit(node.expr))
+
+
+
+def analyzed(text):
+    tree = Parser(Lexer(text)).parse()
+    SemanticAnalyzer().visit(tree)
+    return tree
+
+
+
+def profiled(cls, text):
+    interpreter = cls(analyzed(text))
+    interpreter.interpret()
+    return interpreter
+
+
+
+def test_counts_and_stacks_match_recursive_visits():
+    profiler = profiled(ProfilingInterpreter, PROGRAM)
+    recursive = profiled(RecursiveProfiler, PROGRAM)
+    assert profiler.GLOBAL_SCOPE == recursive.GLOBAL_SCOPE
+    assert sorted(profiler.stacks) == sorted(recursive.stacks)
+    for timings, expected in ((profiler.kinds, recursive.kinds), (profiler.lines, recursive.lines)):
+        assert {name: t["count"] for name, t in timings.items()} == \
+            {name: t["count"] for name, t in expected.items()}
+    assert profiler._stack == [""] and profiler._nested == [profiler._nested[0]]
+
+
+
+def test_expression_deeper_than_the_recursion_limit():
+    terms = 5000
+    text = "PROGRAM Deep; VAR a : INTEGER; BEGIN a := {} END.".format("+".join(["1"] * terms))
+    profiler = profiled(ProfilingInterpreter, text)
+    assert profiler.GLOBAL_SCOPE["a"] == terms
+    assert profiler.kinds["BinOp"]["count"] == terms - 1
+    assert profiler.kinds["Num"]["count"] == terms
+    # Program, Block, Compound and Assign, then every BinOp down to the first Num
+    assert max(key.count(";") + 1 for key in profiler.stacks) == 4 + (terms - 1) + 1
+
+
+
+def test_an_error_leaves_the_timings_balanced():
+    text = "PROGRAM E; VAR a : INTEGER; BEGIN a := 0; a := 1 + (2 - 3 * (4 DIV (a - a))) END."
+    profiler = ProfilingInterpreter(analyzed(text))
+    with pytest.raises(ZeroDivisionError):
+        profiler.interpret()
+    assert profiler._stack == [""] and len(profiler._nested) == 1
+    assert profiler.kinds["BinOp"]["count"] == 5
+
+
+
+def test_only_the_program_is_booked_as_a_procedure():
+    text = "PROGRAM Main; VAR a : INTEGER; PROCEDURE P1; BEGIN END; BEGIN a := 1 END."
+    profiler = profiled(ProfilingInterpreter, text)
+    assert list(profiler.procedures) == ["Main"]
+    assert profiler.kinds["ProcedureDecl"]["count"] == 1
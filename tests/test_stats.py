@@ -0,0 +1,69 @@
+""" PipelineStats measures the default pipeline and counts every scope """
+from lexer import Lexer
+from parser import Parser
+from incremental import TokenList
+from interpreter import SemanticAnalyzer, SymbolStats
+from stats import PipelineStats, lex, walk
+
+
+PROGRAM = """
+PROGRAM Scopes;
+VAR a : INTEGER;
+PROCEDURE P1;
+    VAR x : INTEGER;
+    PROCEDURE Q;
+    VAR q1, q2 : INTEGER;
+    BEGIN END;
+BEGIN END;
+PROCEDURE P2;
+    PROCEDURE Q;
+    VAR r : REAL;
+    BEGIN END;
+BEGIN END;
+BEGIN
+    a := 1 + 2 * -3
+END.
+"""
+
+
+
+def test_same_named_procedures_are_counted_apart():
+    stats = PipelineStats.run(PROGRAM, memory=False)
+    assert stats.symbols == {
+        "global": 5, # INTEGER, REAL, a, P1, P2
+        "global.P1": 2,
+        "global.P1.Q": 2,
+        "global.P2": 1,
+        "global.P2.Q": 1,
+    }
+    assert stats.memory == {"a": -5}
+
+
+
+def test_symbol_stats_count_same_named_procedures_apart():
+    stats = SymbolStats()
+    SemanticAnalyzer(stats).visit(Parser(Lexer(PROGRAM)).parse())
+    assert {scope: counts["defines"] for scope, counts in stats.scopes.items()} == {
+        "global": 5,
+        "global.P1": 2,
+        "global.P1.Q": 2,
+        "global.P2": 1,
+        "global.P2.Q": 1,
+    }
+
+
+
+def test_lex_and_parse_are_the_default_pipeline_split():
+    tokens = lex(PROGRAM)
+    split = Parser(TokenList(tokens)).parse()
+    fused = Parser(Lexer(PROGRAM)).parse()
+    assert [type(node) for node in walk(split)] == [type(node) for node in walk(fused)]
+    assert PipelineStats.run(PROGRAM, memory=False).tokens == len(tokens) - 1
+
+
+
+def test_peak_bytes_leave_out_the_earlier_phases():
+    text = PROGRAM.replace("1 + 2 * -3", "1; a := " + " + ".join(["a"] * 200))
+    phases = PipelineStats.run(text).phases
+    # the tokens and the tree the front end left are not the interpreter's
+    assert phases["interpret"]["peak_bytes"] < phases["lex"]["peak_bytes"] / 10
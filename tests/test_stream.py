@@ -0,0 +1,104 @@
+""" a streamed run gives load_program()'s memory, and stops at the statement that fails """
+import os
+import sys
+
+import pytest
+
+from interpreter import Interpreter, load_program, stream_program
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bench"))
+from generate import generate
+
+
+PROGRAM = """
+PROGRAM Stream;
+VAR
+    a, b, c : INTEGER;
+    x : REAL;
+PROCEDURE Unused;
+VAR a : REAL;
+BEGIN
+    a := 1.5
+END;
+BEGIN
+    a := 7;
+    b := a * 2 + -a;
+    x := a / 4 + b * 1.5;
+    BEGIN
+        c := (a - 3) DIV 2 * -(b + 1);
+        a := a + b * c
+    END;
+    c := a - b ? c : -c
+END.
+"""
+
+
+
+@pytest.fixture
+def source(tmp_path):
+    """ write text to a file, return its path """
+    def write(text):
+        path = str(tmp_path / "program.pas")
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+    return write
+
+
+
+def typed(memory):
+    return {name: (type(value), value) for name, value in memory.items()}
+
+
+
+def loaded(path):
+    interpreter = Interpreter(load_program(path))
+    interpreter.interpret()
+    return interpreter.GLOBAL_SCOPE
+
+
+
+def streamed(path):
+    interpreter = Interpreter(None)
+    interpreter.interpret_stream(*stream_program(path))
+    return interpreter.GLOBAL_SCOPE
+
+
+
+@pytest.mark.parametrize("seed", [None, 1, 2])
+def test_streamed_like_loaded(source, seed):
+    path = source(PROGRAM if seed is None else generate(seed))
+    assert typed(streamed(path)) == typed(loaded(path))
+
+
+
+def run_until_error(path):
+    """ (memory, error) of a streamed run that raises """
+    interpreter = Interpreter(None)
+    with pytest.raises(Exception) as error:
+        interpreter.interpret_stream(*stream_program(path))
+    return interpreter.GLOBAL_SCOPE, error.value
+
+
+
+# load_program() fails on the whole text before anything runs: on the
+# syntax error at the end, or on the undeclared name while it is analyzed
+@pytest.mark.parametrize("statement, error", [
+    ("b := a DIV 0", ZeroDivisionError),
+    ("d := a", NameError),
+])
+def test_error_raised_at_its_statement(source, statement, error):
+    text = "PROGRAM P; VAR a, b, c : INTEGER; BEGIN a := 1; {}; c := 3; c := END.".format(statement)
+    with pytest.raises(Exception):
+        load_program(source(text))
+
+    memory, raised = run_until_error(source(text))
+    assert type(raised) is error
+    assert memory == {"a": 1} # the statements after it were neither parsed nor run
+
+
+
+def test_syntax_error_raised_after_the_statements_before_it(source):
+    memory, raised = run_until_error(source("PROGRAM P; VAR a, b : INTEGER; BEGIN a := 1; b := a + 1; a := * END."))
+    assert str(raised) == "Invalid Syntax"
+    assert memory == {"a": 1, "b": 2}
@@ -0,0 +1,167 @@
+import marshal
+from array import array
+
+from tokens import Token
+from tokens import Tokens
+
+
+
+class TokenBuffer:
+    """ Columnar token stream built by Lexer.tokenize_all()
+
+        token i has type types[i] and value values[value_index[i]], starts at
+        line lines[i], column columns[i] and spans text[starts[i]:ends[i]].
+        equal values are stored once in `values`.
+    """
+    def __init__(self):
+        self.types = array("B")
+        self.starts = array("q")
+        self.ends = array("q")
+        self.lines = array("l")
+        self.columns = array("l")
+        self.value_index = array("i")
+        self.values = []
+        self._interned = {}
+
+    def __len__(self):
+        return len(self.types)
+
+    def __str__(self):
+        return "TokenBuffer({count} tokens, {values} values)".format(
+            count=len(self.types), values=len(self.values))
+
+    __repr__ = __str__
+
+
+    def append(self, token_type, value, start, end, line, column):
+        # int 1 and float 1.0 are equal dict keys, so values are keyed by type too
+        key = (token_type, value)
+        index = self._interned.get(key)
+        if(index is None):
+            index = self._interned[key] = len(self.values)
+            self.values.append(value)
+
+        self.types.append(token_type)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lines.append(line)
+        self.columns.append(column)
+        self.value_index.append(index)
+
+
+    def token(self, index):
+        """ materialize token number `index` as a tokens.Token """
+        return Token(
+            self.types[index],
+            self.values[self.value_index[index]],
+            self.starts[index],
+            self.lines[index],
+            self.columns[index],
+        )
+
+
+    def cursor(self):
+        return TokenCursor(self)
+
+
+    def slice(self, start, stop):
+        """ tokens start up to stop and the EOF token, as a TokenBuffer
+
+            the positions are left as they are. the slice has its own values,
+            only those of its tokens, so to_bytes() of a slice doesn't grow
+            with the whole program.
+        """
+        last = len(self.types) - 1
+        buffer = TokenBuffer()
+        for into, part in (
+            (buffer.types, self.types), (buffer.starts, self.starts),
+            (buffer.ends, self.ends), (buffer.lines, self.lines),
+            (buffer.columns, self.columns),
+        ):
+            into.extend(part[start:stop])
+            into.append(part[last])
+
+        remap = {} # index in self.values -> index in buffer.values
+        values, value_index = buffer.values, buffer.value_index
+        for index in self.value_index[start:stop] + self.value_index[last:]:
+            new = remap.get(index)
+            if(new is None):
+                new = remap[index] = len(values)
+                values.append(self.values[index])
+            value_index.append(new)
+        return buffer
+
+
+    def to_bytes(self):
+        return marshal.dumps((
+            self.types.tobytes(),
+            self.starts.tobytes(),
+            self.ends.tobytes(),
+            self.lines.tobytes(),
+            self.columns.tobytes(),
+            self.value_index.tobytes(),
+            self.values,
+        ))
+
+
+    @classmethod
+    def from_bytes(cls, data):
+        types, starts, ends, lines, columns, value_index, values = marshal.loads(data)
+        buffer = cls()
+        buffer.types.frombytes(types)
+        buffer.starts.frombytes(starts)
+        buffer.ends.frombytes(ends)
+        buffer.lines.frombytes(lines)
+        buffer.columns.frombytes(columns)
+        buffer.value_index.frombytes(value_index)
+        buffer.values = values
+        return buffer
+
+
+
+# token types the Parser only matches and never keeps in the tree
+SHARED_TYPES = (
+    Tokens.LPAREN, Tokens.RPAREN, Tokens.SEMI, Tokens.COLON, Tokens.COMMA,
+    Tokens.DOT, Tokens.BEGIN, Tokens.END, Tokens.VAR, Tokens.PROCEDURE,
+    Tokens.PROGRAM,
+)
+
+
+
+class TokenCursor:
+    """ Reads a TokenBuffer with the lexer interface the Parser expects
+
+        parser = Parser(lexer.tokenize_all().cursor())
+
+        a token of the SHARED_TYPES is one Token per type and cursor, its
+        value and position overwritten by the next token of that type;
+        the other tokens are new Tokens. parentheses and semicolons are
+        about half the tokens of a program, so a token kept past the next
+        one of its type has to be copied.
+    """
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.index = 0
+        self._last = len(buffer) - 1 # the EOF token
+        self._shared = {token_type: Token(token_type, None) for token_type in SHARED_TYPES}
+        # the columns, bound once: get_next_token runs for every token
+        self._columns = (
+            buffer.types, buffer.values, buffer.value_index,
+            buffer.starts, buffer.lines, buffer.columns,
+        )
+
+    def get_next_token(self):
+        index = self.index
+        if(index < self._last):
+            self.index = index + 1
+        types, values, value_index, starts, lines, columns = self._columns
+        token_type = types[index]
+        token = self._shared.get(token_type)
+        if token is None:
+            return Token(token_type, values[value_index[index]], starts[index], lines[index], columns[index])
+
+        token.value = values[value_index[index]]
+        token.offset = starts[index]
+        token.line = lines[index]
+        token.column = columns[index]
+        return token
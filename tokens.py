@@ -1,47 +1,78 @@
+from types import MappingProxyType
+
 
 class Token:
-    def __init__(self, type, value):
+    __slots__ = ("type", "value", "offset", "line", "column")
+
+    def __init__(self, type, value, offset=0, line=0, column=0):
         self.type = type
         self.value = value
+        self.offset = offset # index of the first charactor in the source
+        self.line = line
+        self.column = column
 
     def __str__(self):
-        return "Token({type}, {value})".format(type=self.type, value=self.value)
+        return "Token({type}, {value}, {line}:{column})".format(
+            type=TOKEN_NAMES.get(self.type, self.type),
+            value=self.value,
+            line=self.line,
+            column=self.column
+        )
 
     def __repr__(self):
         return self.__str__()
 
+    def __reduce__(self):
+        # pickles smaller and faster than the slots' state dict (see cache.py)
+        return (Token, (self.type, self.value, self.offset, self.line, self.column))
+
 
 class Tokens:
-    
-    INT_CONST   = "INTEGER_CONST"
-    REAL_CONST  = "REAL_CONST"
-    PLUS        = "PLUS"
-    MINUS       = "MINUS"
-    MUL         = "MUL"
-    FLOATDIV    = "DIV"
-    COLON       = ":"
-    COMMA       = ","
-    LPAREN      = "("
-    RPAREN      = ")"
-    EOF         = "EOF"
-    ID          = "ID"
-    ASSIGN      = "ASSIGN"
-    SEMI        = "SEMI"
-    DOT         = "DOT"
-    TERNARY     = "?"
+    """ token types, a small-integer enum """
+
+    EOF         = 0
+    INT_CONST   = 1
+    REAL_CONST  = 2
+    PLUS        = 3
+    MINUS       = 4
+    MUL         = 5
+    FLOATDIV    = 6
+    COLON       = 7
+    COMMA       = 8
+    LPAREN      = 9
+    RPAREN      = 10
+    ID          = 11
+    ASSIGN      = 12
+    SEMI        = 13
+    DOT         = 14
+    TERNARY     = 15
 
     # RESERVED_KEYWORDS
-    PROGRAM     = Token("PROGRAM", "PROGRAM")
-    VAR         = Token("VAR", "VAR")
-    INTEGER     = Token("INTEGER", "INTEGER") # VAR TYPE
-    REAL        = Token("REAL", "REAL") # VAR TYPE
-    BEGIN       = Token("BEGIN", "BEGIN")
-    END         = Token("END", "END")
-    DIV         = Token("INTDIV", "//")
-    PROCEDURE   = Token("PROCEDURE", "PROCEDURE")
-    
-    
-    
-    
-    
-    
+    PROGRAM     = 16
+    VAR         = 17
+    INTEGER     = 18 # VAR TYPE
+    REAL        = 19 # VAR TYPE
+    BEGIN       = 20
+    END         = 21
+    DIV         = 22 # INT DIV
+    PROCEDURE   = 23
+
+
+TOKEN_NAMES = {
+    value: name for name, value in vars(Tokens).items() if not name.startswith("_")
+}
+
+
+
+# RESERVED_KEYWORDS: upper-cased spelling -> (token type, token value). Pascal
+# keywords are case insensitive, look them up with name.upper()
+RESERVED_KEYWORDS = MappingProxyType({
+    "PROGRAM":   (Tokens.PROGRAM, "PROGRAM"),
+    "VAR":       (Tokens.VAR, "VAR"),
+    "INTEGER":   (Tokens.INTEGER, "INTEGER"),
+    "REAL":      (Tokens.REAL, "REAL"),
+    "BEGIN":     (Tokens.BEGIN, "BEGIN"),
+    "END":       (Tokens.END, "END"),
+    "DIV":       (Tokens.DIV, "//"),
+    "PROCEDURE": (Tokens.PROCEDURE, "PROCEDURE"),
+})